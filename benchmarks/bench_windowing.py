@@ -0,0 +1,70 @@
+"""
+Micro-benchmark: boolean-mask windowing (old _adjust_time + fancy indexing)
+vs searchsorted slice windowing (windowing.time_window).
+
+Run from the repository root:
+    python -m benchmarks.bench_windowing
+"""
+
+import timeit
+
+import numpy as np
+
+import data_handling.windowing as win
+
+
+FS = 10.0
+N_CHANNELS = 46
+N_SAMPLES = [6_000, 60_000, 600_000]
+WINDOW_S = 60.0
+PADDING = 2.0
+REPEAT = 20
+
+
+def mask_window(time_array, data, t_start, t_end, padding):
+    mask = (time_array >= t_start - padding) & (time_array <= t_end + padding)
+    indices = np.where(mask)[0]
+    return time_array[indices] - t_start, data[indices]
+
+
+def slice_window(time_array, data, t_start, t_end, padding, check_monotonic=True):
+    window = win.time_window(time_array, t_start, t_end, padding, check_monotonic=check_monotonic)
+    return time_array[window] - t_start, data[window]
+
+
+def main():
+    print(f"{'n_samples':>10} | {'mask [ms]':>10} | {'slice [ms]':>10} | {'slice, no check [ms]':>20} | speedup")
+
+    for n in N_SAMPLES:
+        time_array = np.arange(n) / FS
+        data = np.random.rand(n, N_CHANNELS)
+
+        t_start = time_array[n // 2]
+        t_end = t_start + WINDOW_S
+
+        t_ref, d_ref = mask_window(time_array, data, t_start, t_end, PADDING)
+        t_new, d_new = slice_window(time_array, data, t_start, t_end, PADDING)
+        assert np.array_equal(t_ref, t_new) and np.array_equal(d_ref, d_new)
+        assert np.shares_memory(d_new, data)
+
+        t_mask = min(timeit.repeat(
+            lambda: mask_window(time_array, data, t_start, t_end, PADDING),
+            number=1, repeat=REPEAT
+        ))
+        t_slice = min(timeit.repeat(
+            lambda: slice_window(time_array, data, t_start, t_end, PADDING),
+            number=1, repeat=REPEAT
+        ))
+        t_slice_nc = min(timeit.repeat(
+            lambda: slice_window(time_array, data, t_start, t_end, PADDING, check_monotonic=False),
+            number=1, repeat=REPEAT
+        ))
+
+        print(
+            f"{n:>10} | {t_mask * 1e3:>10.3f} | {t_slice * 1e3:>10.3f} | "
+            f"{t_slice_nc * 1e3:>20.3f} | {t_mask / t_slice:.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
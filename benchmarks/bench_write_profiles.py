@@ -0,0 +1,92 @@
+"""
+Benchmark of conf.WRITE_PROFILES for cut SNIRF dataTimeSeries:
+file size, write time, full read time and partial (one movie window) read time.
+
+Run from the repository root:
+    python -m benchmarks.bench_write_profiles [path/to/recording.snirf]
+
+With a SNIRF path, its data1/dataTimeSeries is used; otherwise a synthetic
+recording of real size (46 channels, 10 Hz, 40 min, smooth signals) is generated.
+"""
+
+import os
+import sys
+import time
+import tempfile
+
+import h5py
+import numpy as np
+
+import data_handling.config_handling as conf
+from data_handling.segmentation import _dataset_kwargs
+
+
+FS = 10.0
+N_CHANNELS = 46
+DURATION_S = 40 * 60
+WINDOW_S = 64.0
+REPEAT = 5
+
+
+def _synthetic_data():
+    n = int(DURATION_S * FS)
+    rng = np.random.default_rng(0)
+    drift = np.cumsum(rng.normal(0, 1e-3, size=(n, N_CHANNELS)), axis=0)
+    cardiac = 0.01 * np.sin(2 * np.pi * 1.2 * np.arange(n) / FS)[:, None]
+    return 1.0 + drift + cardiac + rng.normal(0, 1e-3, size=(n, N_CHANNELS))
+
+
+def _load_data(path):
+    with h5py.File(path, "r") as f:
+        return f["nirs/data1/dataTimeSeries"][:]
+
+
+def _best_time(fn):
+    times = []
+    for _ in range(REPEAT):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return min(times)
+
+
+def main():
+    data = _load_data(sys.argv[1]) if len(sys.argv) > 1 else _synthetic_data()
+    n_window = int(WINDOW_S * FS)
+    i0 = data.shape[0] // 2
+    window = np.s_[i0:i0 + n_window]
+
+    print(f"data: {data.shape} {data.dtype}, {data.nbytes / 1e6:.1f} MB, window: {n_window} samples")
+    print(f"{'profile':>8} | {'size [MB]':>9} | {'ratio':>5} | {'write [ms]':>10} | "
+          f"{'full read [ms]':>14} | {'window read [ms]':>16}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, profile in conf.WRITE_PROFILES.items():
+            path = os.path.join(tmp, f"{name}.h5")
+            kwargs = _dataset_kwargs(profile, data.shape)
+
+            def write():
+                with h5py.File(path, "w") as f:
+                    f.create_dataset("dataTimeSeries", data=data, **kwargs)
+
+            def read_full():
+                with h5py.File(path, "r") as f:
+                    f["dataTimeSeries"][:]
+
+            def read_window():
+                with h5py.File(path, "r") as f:
+                    f["dataTimeSeries"][window]
+
+            t_write = _best_time(write)
+            size = os.path.getsize(path)
+            t_full = _best_time(read_full)
+            t_window = _best_time(read_window)
+
+            print(
+                f"{name:>8} | {size / 1e6:>9.2f} | {data.nbytes / size:>5.2f} | {t_write * 1e3:>10.1f} | "
+                f"{t_full * 1e3:>14.1f} | {t_window * 1e3:>16.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
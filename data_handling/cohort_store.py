@@ -0,0 +1,268 @@
+"""
+Consolidated cohort store: all cut segments of the external DB in one chunked HDF5.
+
+Layout:
+    index/<column>                       one row per dyad × member × session:
+                                         dyad_id, member, session, path,
+                                         offset, n_samples, n_channels
+    sessions/<session>/time              (total_samples,) time of all entries, concatenated
+    sessions/<session>/dataTimeSeries    (total_samples, max_channels) data1, NaN-padded
+    sessions/<session>/measurementList/<field>
+                                         (n_entries, max_channels) per-entry channel
+                                         description, -1-padded
+
+Entries of a session are contiguous and ordered by (dyad_id, member), so a
+whole session of the cohort (or any dyad range of it) is one hyperslab read.
+Only data1 is packed; aux and stims stay in the SNIRF segments.
+"""
+
+import os
+import time
+
+import h5py
+import numpy as np
+import pandas as pd
+
+import data_handling.config_handling as conf
+import data_handling.snirf_handling as snirf
+import data_handling.segmentation as segmentation
+import data_handling.windowing as win
+import data_handling.external_structure as ext_struct
+from data_handling.external_format import build_path_table
+
+
+INDEX_COLUMNS = ["dyad_id", "member", "session", "path", "offset", "n_samples", "n_channels"]
+
+MEASUREMENT_FIELDS = ("sourceIndex", "detectorIndex", "wavelengthIndex", "dataType", "dataTypeIndex")
+
+
+def _entry_shape(path):
+    with h5py.File(path, "r") as f:
+        data1 = f["nirs/data1"]
+        shape = data1["dataTimeSeries"].shape
+        n_time = data1["time"].shape[0]
+
+    # compact [t0, dt] time (windowing.is_compact_time)
+    compact = n_time == 2 and shape[0] != 2
+
+    if shape[0] != n_time and not compact:
+        raise ValueError(f"time {n_time} does not match dataTimeSeries {shape}: {path}")
+
+    return shape[0], (shape[1] if len(shape) > 1 else 1)
+
+
+def _measurement_list(data1, n_channels):
+    """
+    field -> (n_channels,) int array of the measurementListN groups (-1 if missing).
+    """
+    fields = {field: np.full(n_channels, -1, dtype=np.int64) for field in MEASUREMENT_FIELDS}
+
+    for i_channel in range(n_channels):
+        key = f"measurementList{i_channel + 1}"
+        if key not in data1:
+            continue
+
+        ml = data1[key]
+        for field in MEASUREMENT_FIELDS:
+            if field in ml:
+                fields[field][i_channel] = int(np.ravel(ml[field])[0])
+
+    return fields
+
+
+def _external_dyad_ids(external_structure):
+    """
+    Dyad ids of the dyad directories in the external DB.
+    """
+    # parent of the dyad dirs, from a placeholder dyad
+    modality_dir = os.path.dirname(ext_struct.compile_structure(external_structure).dyad_dir("W000"))
+    dyad_ids = []
+
+    with os.scandir(modality_dir) as it:
+        for entry in it:
+            match = snirf._DYAD_PATTERN.search(entry.name)
+            if entry.is_dir() and match:
+                dyad_ids.append(f"W{match.group(1)}")
+
+    return sorted(dyad_ids)
+
+
+def _build_index(path_table):
+    rows = []
+
+    for entry in path_table.itertuples(index=False):
+        try:
+            n_samples, n_channels = _entry_shape(entry.path)
+        except Exception as e:
+            print(f"[WARN] cohort store: skipping {entry.path}: {type(e).__name__}: {e}")
+            continue
+
+        rows.append({
+            "dyad_id": entry.dyad_id,
+            "member": entry.role,
+            "session": entry.file_key,
+            "path": entry.path,
+            "n_samples": n_samples,
+            "n_channels": n_channels
+        })
+
+    index = pd.DataFrame(rows, columns=[c for c in INDEX_COLUMNS if c != "offset"])
+    index = index.sort_values(["session", "dyad_id", "member"], kind="stable").reset_index(drop=True)
+    index["offset"] = (
+        index.groupby("session")["n_samples"].cumsum() - index["n_samples"]
+    ).astype(np.int64)
+
+    return index[INDEX_COLUMNS]
+
+
+def _write_index(f, index):
+    grp = f.create_group("index")
+
+    for column in INDEX_COLUMNS:
+        values = index[column].to_numpy()
+        if values.dtype == object:
+            grp.create_dataset(column, data=values.astype(str).astype("S"))
+        else:
+            grp.create_dataset(column, data=values.astype(np.int64))
+
+
+def export_cohort_store(
+        store_path=None,
+        dyad_ids=None,
+        external_structure=conf.EXTERNAL_STRUCTURE,
+        sessions=None,
+        roles=("child", "caregiver"),
+        write_profile=None
+):
+    """
+    Packs the cut segments of the external DB into one chunked HDF5 store.
+
+    :param store_path: output file (None -> conf.COHORT_STORE)
+    :param dyad_ids: dyads to pack (None -> all dyad dirs of the external DB)
+    :param sessions: segment labels (None -> all file keys of EXTERNAL_STRUCTURE)
+    :param write_profile: conf.WRITE_PROFILES name or dict (None -> conf.COHORT_WRITE_PROFILE)
+    :return: index DataFrame
+    """
+    store_path = store_path or conf.COHORT_STORE
+    write_profile = segmentation._resolve_write_profile(write_profile or conf.COHORT_WRITE_PROFILE)
+
+    if dyad_ids is None:
+        dyad_ids = _external_dyad_ids(external_structure)
+
+    path_table = build_path_table(dyad_ids, external_structure, roles=roles, file_keys=sessions)
+    index = _build_index(path_table[path_table["exists"]])
+
+    t0 = time.perf_counter()
+    tmp_path = f"{store_path}.writing"
+
+    with h5py.File(tmp_path, "w") as f:
+        _write_index(f, index)
+
+        for session, entries in index.groupby("session", sort=False):
+            total = int(entries["n_samples"].sum())
+            max_channels = int(entries["n_channels"].max())
+            grp = f.create_group(f"sessions/{session}")
+
+            time_dset = grp.create_dataset(
+                "time", shape=(total,), dtype=np.float64,
+                **segmentation._dataset_kwargs(write_profile, (total,))
+            )
+            data_dset = grp.create_dataset(
+                "dataTimeSeries", shape=(total, max_channels), dtype=np.float64,
+                fillvalue=np.nan,
+                **segmentation._dataset_kwargs(write_profile, (total, max_channels))
+            )
+            ml = {
+                field: np.full((len(entries), max_channels), -1, dtype=np.int64)
+                for field in MEASUREMENT_FIELDS
+            }
+
+            for i_entry, entry in enumerate(entries.itertuples(index=False)):
+                rows = slice(entry.offset, entry.offset + entry.n_samples)
+
+                with h5py.File(entry.path, "r") as src:
+                    data1 = snirf.SnirfView(src)["nirs"]["data1"]
+                    time_dset[rows] = win.expand_time(data1.read("time"), entry.n_samples)
+                    data_dset[rows, :entry.n_channels] = data1.read("dataTimeSeries").reshape(
+                        entry.n_samples, entry.n_channels
+                    )
+                    for field, values in _measurement_list(data1, entry.n_channels).items():
+                        ml[field][i_entry, :entry.n_channels] = values
+
+            for field, values in ml.items():
+                grp.create_dataset(f"measurementList/{field}", data=values)
+
+            print(f"Packed: {session} | {len(entries)} entries | {total} samples")
+
+    os.replace(tmp_path, store_path)
+    print(f"Cohort store: {store_path} | {len(index)} entries | {time.perf_counter() - t0:.1f}s")
+
+    return index
+
+
+def read_index(store_path=None):
+    """
+    Index DataFrame of a cohort store (INDEX_COLUMNS).
+    """
+    with h5py.File(store_path or conf.COHORT_STORE, "r") as f:
+        return _read_index(f)
+
+
+def _read_index(f):
+    grp = f["index"]
+    index = pd.DataFrame({column: grp[column][()] for column in INDEX_COLUMNS})
+
+    for column in ("dyad_id", "member", "session", "path"):
+        index[column] = index[column].str.decode("utf-8")
+
+    return index
+
+
+def read_session(session, store_path=None, dyad_ids=None, members=None):
+    """
+    Loads one session of the cohort with a single hyperslab read per dataset.
+
+    :param dyad_ids / members: optional selection; the read covers the
+                               contiguous range spanning the selected entries
+    :return: (entries, data) with
+             entries: index rows of the selected entries
+             data: (dyad_id, member) -> {"time": (n,), "dataTimeSeries": (n, n_channels),
+                   "measurementList": {field: (n_channels,)}} (views of the block read)
+    """
+    with h5py.File(store_path or conf.COHORT_STORE, "r") as f:
+        index = _read_index(f)
+
+        session_index = index[index["session"] == session].reset_index(drop=True)
+        selected = session_index
+        if dyad_ids is not None:
+            selected = selected[selected["dyad_id"].isin(list(dyad_ids))]
+        if members is not None:
+            selected = selected[selected["member"].isin(list(members))]
+
+        if selected.empty:
+            return selected, {}
+
+        lo = int(selected["offset"].min())
+        hi = int((selected["offset"] + selected["n_samples"]).max())
+
+        grp = f[f"sessions/{session}"]
+        time_block = grp["time"][lo:hi]
+        data_block = grp["dataTimeSeries"][lo:hi]
+        ml = {field: grp[f"measurementList/{field}"][()] for field in MEASUREMENT_FIELDS}
+
+    data = {}
+    for i_entry, entry in selected.iterrows():
+        rows = slice(entry["offset"] - lo, entry["offset"] - lo + entry["n_samples"])
+        n_channels = entry["n_channels"]
+
+        data[(entry["dyad_id"], entry["member"])] = {
+            "time": time_block[rows],
+            "dataTimeSeries": data_block[rows, :n_channels],
+            "measurementList": {field: values[i_entry, :n_channels] for field, values in ml.items()}
+        }
+
+    return selected.reset_index(drop=True), data
+
+
+if __name__ == "__main__":
+    export_cohort_store()
@@ -25,9 +25,27 @@ OUTPUT_COMP_CHILD = f"{ROOT_RAW}meta_comp_child.csv"
 OUTPUT_PATHS_CAREGIVER =  f"{ROOT_RAW}meta_paths_caregiver.csv"
 OUTPUT_PATHS_CHILD =  f"{ROOT_RAW}meta_paths_child.csv"
 
+# one-pass directory index of SNIRF_DIR_CHILD / SNIRF_DIR_CAREGIVER,
+# invalidated by directory mtime (kept outside the indexed dirs)
+SNIRF_INDEX_CACHE = f"{ROOT_RAW}meta_dir_index.json"
+
+# SQLite catalog of raw SNIRF metadata (snirf_catalog.refresh_catalog)
+SNIRF_CATALOG = f"{ROOT_RAW}meta_catalog.sqlite"
+
+# schema validation report of raw SNIRF files (snirf_validation.validate_corpus)
+SNIRF_VALIDATION_REPORT = f"{ROOT_RAW}meta_validation.csv"
+
 # INTERNAL DB
 OUTPUT_INTERNAL_DB = f"{ROOT}fnirs_data_internal_format//"
 
+# how whole raw files are placed in the internal DB and as fc1/fc2 in the external DB:
+# "hardlink" | "reflink" | "symlink" | "copy" (see file_placement.py, falls back to copy)
+PLACEMENT_STRATEGY = "copy"
+
+# COHORT STORE: all cut segments packed in one chunked HDF5 (cohort_store.py)
+COHORT_STORE = f"{ROOT}fnirs_data_cohort.h5"
+COHORT_WRITE_PROFILE = "lzf"
+
 # EXTERNAL DB
 '''
 https://github.com/SYNCC-IN/hyperscanning-signal-analysis/blob/main/docs/export_ncdf_guide.md
@@ -41,38 +59,40 @@ https://gitlab.com/a.bizzego/synccin
 
 '''
 
+# "format": template string with {dyad_id} (W050), {letter} (W), {number} (050);
+# callables taking the dyad id are still accepted (see external_structure.py)
 EXTERNAL_STRUCTURE = {
     "root": {
-        "format": lambda d_id: f"{ROOT}UNIWAW_imported//",
+        "format": f"{ROOT}UNIWAW_imported//",
         "modality": {
-            "format": lambda d_id: "FNIRS",
+            "format": "FNIRS",
             "dyad": {
-                "format": lambda d_id: f"{d_id[0]}_{d_id[1:]}",
+                "format": "{letter}_{number}",
                 "child_dir":{
-                    "format": lambda d_id: f"child",
+                    "format": "child",
                     "movie_brave": {
-                        "format": lambda d_id: f"{d_id[0]}_{d_id[1:]}_FNIRS_ch_Brave.snirf"},
+                        "format": "{letter}_{number}_FNIRS_ch_Brave.snirf"},
                     "movie_peppa": {
-                        "format": lambda d_id: f"{d_id[0]}_{d_id[1:]}_FNIRS_ch_Peppa.snirf"},
+                        "format": "{letter}_{number}_FNIRS_ch_Peppa.snirf"},
                     "movie_incredibles": {
-                        "format": lambda d_id: f"{d_id[0]}_{d_id[1:]}_FNIRS_ch_Incredibles.snirf"},
+                        "format": "{letter}_{number}_FNIRS_ch_Incredibles.snirf"},
                     "fc1": {
-                        "format": lambda d_id: f"{d_id[0]}_{d_id[1:]}_FNIRS_ch_Talk1.snirf"},
+                        "format": "{letter}_{number}_FNIRS_ch_Talk1.snirf"},
                     "fc2": {
-                        "format": lambda d_id: f"{d_id[0]}_{d_id[1:]}_FNIRS_ch_Talk2.snirf"}
+                        "format": "{letter}_{number}_FNIRS_ch_Talk2.snirf"}
                 },
                 "caregiver_dir":{
-                    "format": lambda d_id: f"caregiver",
+                    "format": "caregiver",
                     "movie_brave": {
-                        "format": lambda d_id: f"{d_id[0]}_{d_id[1:]}_FNIRS_cg_Brave.snirf"},
+                        "format": "{letter}_{number}_FNIRS_cg_Brave.snirf"},
                     "movie_peppa": {
-                        "format": lambda d_id: f"{d_id[0]}_{d_id[1:]}_FNIRS_cg_Peppa.snirf"},
+                        "format": "{letter}_{number}_FNIRS_cg_Peppa.snirf"},
                     "movie_incredibles": {
-                        "format": lambda d_id: f"{d_id[0]}_{d_id[1:]}_FNIRS_cg_Incredibles.snirf"},
+                        "format": "{letter}_{number}_FNIRS_cg_Incredibles.snirf"},
                     "fc1": {
-                        "format": lambda d_id: f"{d_id[0]}_{d_id[1:]}_FNIRS_cg_Talk1.snirf"},
+                        "format": "{letter}_{number}_FNIRS_cg_Talk1.snirf"},
                     "fc2": {
-                        "format": lambda d_id: f"{d_id[0]}_{d_id[1:]}_FNIRS_cg_Talk2.snirf"}
+                        "format": "{letter}_{number}_FNIRS_cg_Talk2.snirf"}
                 }
             }
         }
@@ -165,4 +185,44 @@ SNIRF_GOAL_STRUCTURE = {
     "probe": True
 }
 
-PADDING = 2.00
\ No newline at end of file
+PADDING = 2.00
+
+# segment types written to the external DB (external_format.build_segment_table)
+# source:     raw segment file (create_meta_df column: movies / fc1 / fc2)
+# start/stop: stim time columns bounding the segment (None -> whole file placed)
+# stim_map:   source stim -> output stim
+# padding:    optional, defaults to PADDING
+SEGMENT_SPECS = {
+    "movie_brave": {
+        "source": "movies", "start": "1", "stop": "2",
+        "stim_map": {"stim1": "stim1", "stim2": "stim2"}},
+    "movie_peppa": {
+        "source": "movies", "start": "3", "stop": "4",
+        "stim_map": {"stim3": "stim1", "stim4": "stim2"}},
+    "movie_incredibles": {
+        "source": "movies", "start": "5", "stop": "6",
+        "stim_map": {"stim5": "stim1", "stim6": "stim2"}},
+    "fc1": {"source": "fc1", "start": None, "stop": None, "stim_map": None},
+    "fc2": {"source": "fc2", "start": None, "stop": None, "stim_map": None},
+}
+
+# HDF5 storage of dataTimeSeries (data1, aux1-6) in cut SNIRF segments
+# compression: None | "lzf" | "gzip" (compression_opts = gzip level 0-9)
+# chunk_time: samples per chunk along time (None -> contiguous, no filters)
+WRITE_PROFILES = {
+    "none": {"compression": None, "compression_opts": None, "shuffle": False, "chunk_time": None},
+    "lzf": {"compression": "lzf", "compression_opts": None, "shuffle": True, "chunk_time": 1024},
+    "gzip1": {"compression": "gzip", "compression_opts": 1, "shuffle": True, "chunk_time": 1024},
+    "gzip4": {"compression": "gzip", "compression_opts": 4, "shuffle": True, "chunk_time": 1024},
+    "gzip9": {"compression": "gzip", "compression_opts": 9, "shuffle": True, "chunk_time": 1024},
+}
+
+WRITE_PROFILE = "none"
+
+# RAM budget of one cut (segmentation.extract_segments): above it, time series
+# are streamed source -> output in time chunks instead of being read at once
+CUT_RAM_BUDGET_MB = 256
+
+# write uniformly sampled time vectors of cut segments in the compact SNIRF
+# form [t0, dt] (readers must support it; see windowing.expand_time)
+COMPACT_TIME = False
\ No newline at end of file
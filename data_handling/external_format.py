@@ -1,15 +1,23 @@
 import os
+import io
+import time
+import contextlib
 import pandas as pd
 import h5py
 import numpy as np
-import shutil
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 import data_handling.snirf_handling as snirf
 import data_handling.config_handling as conf
+import data_handling.windowing as win
+import data_handling.segmentation as segmentation
+import data_handling.external_structure as ext_struct
+import data_handling.snirf_validation as validation
 
 def _resolve_path(dyad_id, external_structure, role=None, file_key=None):
     """
-    Resolves paths from EXTERNAL_STRUCTURE.
+    Resolves paths from EXTERNAL_STRUCTURE (template or lambda dict,
+    or a compiled external_structure.CompiledStructure).
 
     Returns:
         dict with:
@@ -20,64 +28,65 @@ def _resolve_path(dyad_id, external_structure, role=None, file_key=None):
             full_dir (deepest directory)
             file_path (optional)
     """
+    return ext_struct.compile_structure(external_structure).resolve(dyad_id, role=role, file_key=file_key)
 
-    root_struct = external_structure["root"]
-    modality_struct = root_struct["modality"]
-    dyad_struct = modality_struct["dyad"]
 
-    # -------------------------
-    # BASE PATHS
-    # -------------------------
-    root_path = root_struct["format"](dyad_id)
-
-    modality_path = os.path.join(
-        root_path,
-        modality_struct["format"](dyad_id)
-    )
-
-    dyad_path = os.path.join(
-        modality_path,
-        dyad_struct["format"](dyad_id)
-    )
+def _scan_existing(dirs):
+    """
+    Directory -> set of file names, one os.scandir per directory
+    (missing directory -> empty set).
+    """
+    existing = {}
 
-    result = {
-        "root": root_path,
-        "modality": modality_path,
-        "dyad": dyad_path
-    }
+    for dir_path in dirs:
+        try:
+            with os.scandir(dir_path) as it:
+                existing[dir_path] = {entry.name for entry in it if entry.is_file()}
+        except (FileNotFoundError, NotADirectoryError):
+            existing[dir_path] = set()
 
-    # -------------------------
-    # ROLE (child / caregiver)
-    # -------------------------
-    if role is not None:
+    return existing
 
-        role_key = f"{role}_dir"
-        role_struct = dyad_struct[role_key]
 
-        role_path = os.path.join(
-            dyad_path,
-            role_struct["format"](dyad_id)
-        )
+def build_path_table(
+        dyad_ids,
+        external_structure=conf.EXTERNAL_STRUCTURE,
+        roles=("child", "caregiver"),
+        file_keys=None,
+        check_exists=True
+):
+    """
+    Resolves EXTERNAL_STRUCTURE once for all dyad × role × file_key.
 
-        result["role"] = role_path
-        result["full_dir"] = role_path
+    The existence column comes from one directory listing per role directory
+    instead of os.path.exists per file.
 
-        # -------------------------
-        # FILE
-        # -------------------------
-        if file_key is not None:
+    :param file_keys: file keys to include (None -> all keys of each role dir)
+    :return: DataFrame: dyad_id, role, file_key, path, exists
+             (ordered by dyad, then roles / file_keys as given)
+    """
+    structure = ext_struct.compile_structure(external_structure)
+    rows = []
 
-            if file_key not in role_struct:
-                raise ValueError(f"{file_key} not found in {role_key}")
+    for dyad_id in dyad_ids:
+        for role in roles:
+            role_dir = structure.role_dir(dyad_id, role)
+            keys = file_keys if file_keys is not None else structure.file_keys(role)
 
-            filename = role_struct[file_key]["format"](dyad_id)
+            for file_key in keys:
+                filename = structure.file_name(dyad_id, role, file_key)
+                rows.append((dyad_id, role, file_key, role_dir, filename))
 
-            result["file_path"] = os.path.join(role_path, filename)
+    table = pd.DataFrame(rows, columns=["dyad_id", "role", "file_key", "dir", "filename"])
+    table["path"] = [os.path.join(d, f) for d, f in zip(table["dir"], table["filename"])]
 
+    if check_exists:
+        existing = _scan_existing(table["dir"].unique())
+        table["exists"] = [f in existing[d] for d, f in zip(table["dir"], table["filename"])]
     else:
-        result["full_dir"] = dyad_path
+        table["exists"] = False
 
-    return result
+    return table[["dyad_id", "role", "file_key", "path", "exists"]]
 
 
 def create_struct_skeleton(comp_merged, external_structure):
@@ -150,18 +159,23 @@ def inspect_padding_availability(
             # LOAD TIME
             # -------------------------
             with h5py.File(snirf_path, "r") as f:
-                snirf_dict = snirf.h5_to_dict(f)
+                snirf_view = snirf.SnirfView(f)
+
+                nirs = snirf_view.get("nirs", {})
+                data1 = nirs.get("data1", {})
+
+                if "time" not in data1:
+                    print(f"[WARN] no time in {dyad_id}")
+                    continue
 
-            nirs = snirf_dict.get("nirs", {})
-            data1 = nirs.get("data1", {})
+                time_ds = data1["time"]
 
-            if "time" not in data1:
-                print(f"[WARN] no time in {dyad_id}")
+            extent = win.time_extent(time_ds)
+            if extent is None:
+                print(f"[WARN] empty time in {dyad_id}")
                 continue
 
-            time = data1["time"]
-            t_min = np.min(time)
-            t_max = np.max(time)
+            t_min, t_max = extent
 
             # -------------------------
             # STIM SEGMENTS (UNORDERED)
@@ -198,119 +212,104 @@ def inspect_padding_availability(
     process(paths_caregivers, "caregiver")
 
 
-def _adjust_time(time_array, t_start, t_end, padding=0.0):
-    """
-    Returns:
-    - adjusted time (rebased so that t_start → 0)
-    - indices to keep
+def _segment_rows(dyad_id, role, source_key, source, stim_row, external_structure,
+                  segment_specs, padding, output_paths=None):
     """
+    Segment table rows (see segmentation.py) of one raw source file.
 
-    t_min = t_start - padding
-    t_max = t_end + padding
-
-    mask = (time_array >= t_min) & (time_array <= t_max)
-
-    if not np.any(mask):
-        return None, None
-
-    indices = np.where(mask)[0]
-
-    new_time = time_array[indices]
-    new_time = new_time - t_start
-
-    return new_time, indices
-
-
-def _adjust_dataTimeSeries(data, indices):
-    """
-    Uses indices from _adjust_time
+    :param output_paths: optional (dyad_id, role, label) -> path from build_path_table
     """
-    if indices is None:
-        return None
+    rows = []
 
-    return data[indices]
+    for label, spec in segment_specs.items():
+        if spec["source"] != source_key:
+            continue
 
+        if output_paths is not None:
+            output = output_paths[(dyad_id, role, label)]
+        else:
+            output = _resolve_path(dyad_id, external_structure, role=role, file_key=label)["file_path"]
 
-def _adjust_metaDataTags(meta, indices, t_start):
-    """
-    Adjusts metadata according to selected indices and time rebasing.
+        if spec["start"] is None:
+            mode, start, stop = "place", np.nan, np.nan
+        else:
+            mode = "cut"
+            start = stim_row[spec["start"]] if stim_row is not None else np.nan
+            stop = stim_row[spec["stop"]] if stim_row is not None else np.nan
+
+        rows.append({
+            "dyad_id": dyad_id,
+            "role": role,
+            "label": label,
+            "mode": mode,
+            "source_key": source_key,
+            "source": source if isinstance(source, str) else None,
+            "output": output,
+            "start": float(start),
+            "stop": float(stop),
+            "padding": float(spec.get("padding", padding)),
+            "stim_map": spec["stim_map"]
+        })
+
+    return rows
+
+
+def build_segment_table(
+        paths_children=conf.OUTPUT_PATHS_CHILD,
+        paths_caregivers=conf.OUTPUT_PATHS_CAREGIVER,
+        stim_df=None,
+        external_structure=conf.EXTERNAL_STRUCTURE,
+        segment_specs=None,
+        padding=None
+):
     """
+    Builds the segment table: one row per dyad × role × segment label
+    of conf.SEGMENT_SPECS (movies cut by stim times, talks placed whole).
 
-    adjusted = {}
-
-    # -------------------------
-    # missing_sample
-    # -------------------------
-    if "missing_sample" in meta:
-        adjusted["missing_sample"] = meta["missing_sample"][indices]
-
-    # -------------------------
-    # sample_index (relative to hardware → just slice)
-    # -------------------------
-    if "sample_index" in meta:
-        adjusted["sample_index"] = meta["sample_index"][indices]
-
-    # -------------------------
-    # device_timestamp (NO OFFSET, only slice)
-    # -------------------------
-    if "device_timestamp" in meta:
-        adjusted["device_timestamp"] = meta["device_timestamp"][indices]
-
-    # -------------------------
-    # first_timestamp (OFFSET LIKE TIME)
-    # -------------------------
-    if "first_timestamp" in meta:
-        adjusted["first_timestamp"] = meta["first_timestamp"] - t_start
-
-    return adjusted
-
-
-def _check_overlap(segments):
-    intervals = list(segments.values())
-
-    for i in range(len(intervals)):
-        for j in range(i + 1, len(intervals)):
-            a_start, a_end = intervals[i]
-            b_start, b_end = intervals[j]
-
-            if max(a_start, b_start) < min(a_end, b_end):
-                print("Warning: overlapping movie segments detected")
-
-
-def _safe_write_dataset(group, key, value):
+    :param paths_children / paths_caregivers: paths CSV (create_meta_df) or DataFrame
+    :param stim_df: stim times (extract_movies_stim_info), dyad_id column or index
+    :return: DataFrame with segmentation.py columns, children first
+    """
+    if segment_specs is None:
+        segment_specs = conf.SEGMENT_SPECS
+    if padding is None:
+        padding = conf.PADDING
 
-    if isinstance(value, dict):
-        subgrp = group.create_group(key)
-        for k, v in value.items():
-            _safe_write_dataset(subgrp, k, v)
-        return
+    if "dyad_id" in stim_df.columns:
+        stim_df = stim_df.set_index("dyad_id")
 
-    # -----------------------------
-    # FORCE unicode-safe conversion
-    # -----------------------------
-    if isinstance(value, np.ndarray):
+    source_keys = list(dict.fromkeys(spec["source"] for spec in segment_specs.values()))
+    rows = []
 
-        if value.dtype.kind in {"U", "O"}:
-            value = np.array([str(x) for x in value.flatten()], dtype="S")
+    for df_path, role in [(paths_children, "child"), (paths_caregivers, "caregiver")]:
+        if isinstance(df_path, pd.DataFrame):
+            df = df_path
+        else:
+            df = pd.read_csv(df_path, sep=None, engine="python")
 
-    elif isinstance(value, list):
+        path_table = build_path_table(
+            df["dyad_id"].unique(), external_structure,
+            roles=(role,), file_keys=list(segment_specs), check_exists=False
+        )
+        output_paths = dict(zip(
+            zip(path_table["dyad_id"], path_table["role"], path_table["file_key"]),
+            path_table["path"]
+        ))
 
-        # detect string list
-        if len(value) > 0 and isinstance(value[0], str):
-            value = np.array([x.encode("utf-8") for x in value], dtype="S")
-        else:
-            try:
-                value = np.array(value)
-            except Exception:
-                value = np.array(str(value), dtype="S")
+        for _, row in df.iterrows():
+            dyad_id = row["dyad_id"]
+            stim_row = stim_df.loc[dyad_id] if dyad_id in stim_df.index else None
 
-    elif isinstance(value, str):
-        value = value.encode("utf-8")
+            for source_key in source_keys:
+                rows.extend(_segment_rows(
+                    dyad_id, role, source_key, row.get(source_key, None), stim_row,
+                    external_structure, segment_specs, padding, output_paths
+                ))
 
-    try:
-        group.create_dataset(key, data=value)
-    except Exception:
-        group.create_dataset(key, data=str(value).encode("utf-8"))
+    return pd.DataFrame(rows, columns=[
+        "dyad_id", "role", "label", "mode", "source_key", "source", "output",
+        "start", "stop", "padding", "stim_map"
+    ])
 
 
 def _cut_movies(
@@ -319,131 +318,104 @@ def _cut_movies(
         dyad_id,
         is_child,
         external_structure,
-        snirf_goal_structure
+        snirf_goal_structure,
+        force=False,
+        write_profile=None
 ):
     """
     Cuts SNIRF into 3 movie files, rebases time, and maps
     segment-specific triggers to stim1 and stim2.
+
+    Thin wrapper over segmentation.extract_segments for the movie
+    segments of conf.SEGMENT_SPECS.
+
+    :param stim_times: stim1..stim6 times (start/stop of Brave, Peppa, Incredibles)
     """
+    stim_row = {str(i + 1): t for i, t in enumerate(stim_times)}
 
-    paths = _resolve_path(
+    segments = _segment_rows(
         dyad_id,
+        "child" if is_child else "caregiver",
+        "movies",
+        snirf_path,
+        stim_row,
         external_structure,
-        role="child" if is_child else "caregiver"
+        conf.SEGMENT_SPECS,
+        conf.PADDING
     )
 
-    base_path = paths["full_dir"]
-    os.makedirs(base_path, exist_ok=True)
+    segmentation.extract_segments(
+        snirf_path,
+        segments,
+        snirf_goal_structure,
+        write_profile=write_profile,
+        force=force
+    )
 
-    with h5py.File(snirf_path, "r") as f:
-        snirf_dict = snirf.h5_to_dict(f)
 
-    nirs = snirf_dict.get("nirs", {})
+def _run_cut_job(job):
+    """
+    Process-pool entry point.
+    Runs the segment rows of one dyad × role with captured prints
+    and returns its status and timing.
+    """
+    buffer = io.StringIO()
+    error = None
+    t0 = time.perf_counter()
 
-    # Mapping segments to their source trigger indices
-    # e.g., Peppa (stim_key "3") uses stim3 for start and stim4 for end
-    segments = {
-        "1": (stim_times[0], stim_times[1]),  # Brave
-        "3": (stim_times[2], stim_times[3]),  # Peppa
-        "5": (stim_times[4], stim_times[5]),  # Incredibles
+    try:
+        with contextlib.redirect_stdout(buffer):
+            segmentation.run_segments(**job["kwargs"])
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+
+    messages = buffer.getvalue().splitlines()
+
+    if error is not None:
+        status = "failed"
+    elif any(msg.startswith("[WARN]") for msg in messages):
+        status = "warn"
+    elif messages and all(msg.startswith("[SKIP]") for msg in messages):
+        status = "unchanged"
+    else:
+        status = "ok"
+
+    return {
+        "dyad_id": job["dyad_id"],
+        "role": job["role"],
+        "status": status,
+        "seconds": time.perf_counter() - t0,
+        "messages": messages,
+        "error": error
     }
 
-    _check_overlap(segments)
-
-    for stim_key, (t_start, t_end) in segments.items():
-        movie_key = conf.MOVIE_MAP[stim_key]
-        paths = _resolve_path(
-            dyad_id,
-            external_structure,
-            role="child" if is_child else "caregiver",
-            file_key=movie_key
-        )
-        output_path = paths["file_path"]
-
-        # Reference time for indexing
-        ref_container = nirs.get("data1")
-        if ref_container is None or "time" not in ref_container:
-            print(f"[WARN] {dyad_id} {movie_key}: missing reference time")
-            continue
-
-        ref_time = ref_container["time"]
-        _, ref_indices = _adjust_time(ref_time, t_start, t_end, padding=conf.PADDING)
-
-        if ref_indices is None:
-            print(f"[WARN] {dyad_id} {movie_key}: empty segment")
-            continue
-
-        with h5py.File(output_path, "w") as out_f:
-            nirs_grp = out_f.create_group("nirs")
-            written_any = False
-
-            # 1. PROCESS STANDARD CONTAINERS (Data, Aux, Meta, Probe)
-            for container_name, keep in snirf_goal_structure.items():
-                if not keep or container_name not in nirs:
-                    continue
-
-                # Metadata logic
-                if container_name == "metaDataTags":
-                    grp = nirs_grp.create_group("metaDataTags")
-                    adj_meta = _adjust_metaDataTags(nirs[container_name], ref_indices, t_start)
-                    for k, v in nirs[container_name].items():
-                        _safe_write_dataset(grp, k, adj_meta[k] if k in adj_meta else v)
-                    written_any = True
-                    continue
-
-                # Time-based containers (data1, aux1-6)
-                container = nirs[container_name]
-                if isinstance(container, dict) and "time" in container:
-                    grp = nirs_grp.create_group(container_name)
-                    new_time = container["time"][ref_indices] - t_start
-
-                    for k, v in container.items():
-                        if k == "time":
-                            grp.create_dataset("time", data=new_time)
-                        elif k == "dataTimeSeries":
-                            new_data = _adjust_dataTimeSeries(v, ref_indices)
-                            grp.create_dataset("dataTimeSeries", data=new_data)
-                        else:
-                            _safe_write_dataset(grp, k, v)
-                    written_any = True
-                    continue
-
-                # Probe/Static copy
-                grp = nirs_grp.create_group(container_name)
-                for k, v in container.items():
-                    _safe_write_dataset(grp, k, v)
-                written_any = True
-
-            # 2. PROCESS STIMULUS RE-MAPPING
-            # Maps stim[N] -> stim1 and stim[N+1] -> stim2
-            start_idx = int(stim_key)
-            stim_map = {
-                f"stim{start_idx}": "stim1",
-                f"stim{start_idx + 1}": "stim2"
-            }
 
-            for src_key, target_key in stim_map.items():
-                if src_key in nirs:
-                    s_grp = nirs_grp.create_group(target_key)
-                    src_data = nirs[src_key]
+def _print_cut_summary(results, wall_time):
+    """
+    Prints per-job results in a deterministic order (role, dyad number).
+    """
+    role_order = {"child": 0, "caregiver": 1}
+    results = sorted(
+        results,
+        key=lambda r: (role_order[r["role"]], int(r["dyad_id"][1:]))
+    )
 
-                    if "data" in src_data:
-                        # Re-base trigger time: t_new = t_old - t_start
-                        raw_data = np.array(src_data["data"])
-                        if raw_data.ndim == 1:
-                            raw_data = raw_data.reshape(1, -1)
+    print("\n===== CUT SUMMARY =====")
 
-                        # Apply time shift to the first column [0]
-                        raw_data[:, 0] = raw_data[:, 0] - t_start
-                        s_grp.create_dataset("data", data=raw_data)
+    for r in results:
+        print(f"{r['dyad_id']} | {r['role']} | {r['status']} | {r['seconds']:.2f}s")
+        for msg in r["messages"]:
+            print(f"    {msg}")
+        if r["error"] is not None:
+            print(f"    [ERROR] {r['error']}")
 
-                    if "name" in src_data:
-                        _safe_write_dataset(s_grp, "name", src_data["name"])
+    counts = pd.Series([r["status"] for r in results]).value_counts()
+    job_time = sum(r["seconds"] for r in results)
 
-        if not written_any:
-            os.remove(output_path)
-        else:
-            print(f"Saved: {output_path}")
+    print(
+        " | ".join(f"{status}: {n}" for status, n in counts.items())
+        + f" | job time: {job_time:.1f}s | wall time: {wall_time:.1f}s"
+    )
 
 
 def cut_all_movies(
@@ -451,100 +423,92 @@ def cut_all_movies(
         paths_caregivers=conf.OUTPUT_PATHS_CAREGIVER,
         stim_df_input=None,  # New parameter
         external_structure=conf.EXTERNAL_STRUCTURE,
-        snirf_goal_structure=conf.SNIRF_GOAL_STRUCTURE
+        snirf_goal_structure=conf.SNIRF_GOAL_STRUCTURE,
+        workers=1,
+        force=False,
+        write_profile=None,
+        placement_strategy=None,
+        segment_specs=None,
+        ram_budget_mb=None,
+        compact_time=None,
+        validation_report=None
 ):
-    # Use the passed DF, or fall back to reading the file if None
-    stim_df = stim_df_input.set_index("dyad_id")
+    """
+    Extracts all segments of conf.SEGMENT_SPECS (movies cut, fc1/fc2 placed whole)
+    for all dyads, children then caregivers.
+    Outputs that are already up to date (fingerprint / placement) are skipped.
+
+    :param workers: 1 → serial run with live prints;
+                    N > 1 → dyad × role jobs run in a pool of N processes,
+                    and a summary (status, timings, messages) is printed at the end
+    :param force: re-cut and re-copy everything
+    :param write_profile: storage of cut dataTimeSeries, name in conf.WRITE_PROFILES
+                          or dict (None -> conf.WRITE_PROFILE)
+    :param placement_strategy: how fc1/fc2 files are placed: "hardlink" | "reflink" |
+                               "symlink" | "copy" (None -> conf.PLACEMENT_STRATEGY)
+    :param segment_specs: segment types (None -> conf.SEGMENT_SPECS)
+    :param ram_budget_mb: RAM budget of one cut; above it data is streamed in time chunks
+                          (None -> conf.CUT_RAM_BUDGET_MB). With N workers, peak memory
+                          of the cut is about N × ram_budget_mb.
+    :param compact_time: write uniformly sampled time as [t0, dt] (None -> conf.COMPACT_TIME)
+    :param validation_report: validate_corpus report (DataFrame or CSV path, e.g.
+                              conf.SNIRF_VALIDATION_REPORT); segments of raw files
+                              with errors are skipped
+    :return: list of per-job result dicts (parallel mode only)
+    """
+    # output paths are resolved here, so workers only receive plain rows
+    segment_table = build_segment_table(
+        paths_children=paths_children,
+        paths_caregivers=paths_caregivers,
+        stim_df=stim_df_input,
+        external_structure=external_structure,
+        segment_specs=segment_specs
+    )
+
+    if validation_report is not None:
+        invalid = segment_table["source"].isin(validation.invalid_paths(validation_report))
+        for source in segment_table.loc[invalid, "source"].unique():
+            print(f"[SKIP] invalid SNIRF file: {source}")
+        segment_table = segment_table[~invalid]
+
+    jobs = []
+    for (dyad_id, role), rows in segment_table.groupby(["dyad_id", "role"], sort=False):
+        jobs.append({
+            "dyad_id": dyad_id,
+            "role": role,
+            "kwargs": {
+                "segments": rows.to_dict("records"),
+                "snirf_goal_structure": snirf_goal_structure,
+                "write_profile": segmentation._resolve_write_profile(write_profile),
+                "placement_strategy": placement_strategy or conf.PLACEMENT_STRATEGY,
+                "force": force,
+                "ram_budget_mb": ram_budget_mb,
+                "compact_time": compact_time
+            }
+        })
 
     # -------------------------------------------------
-    # helper: process one table (children/caregivers)
+    # serial
     # -------------------------------------------------
-    def process_table(df_path, is_child):
-
-        df = pd.read_csv(df_path, sep=None, engine="python")
-
-        for _, row in df.iterrows():
-            dyad_id = row["dyad_id"]
-
-            # -------------------------------------------------
-            # get stim times (unordered -> fix ordering)
-            # -------------------------------------------------
-            if dyad_id not in stim_df.index:
-                print(f"[WARN] missing stim for {dyad_id}")
-                continue
-
-            # -------------------------------------------------
-            # 1. CUT MOVIES SNIRF
-            # -------------------------------------------------
-            movie_path = row["movies"]
-
-            if isinstance(movie_path, str) and os.path.exists(movie_path):
-                stim_row = stim_df.loc[dyad_id]
-
-                stim_times_list = [
-                    stim_row["1"], stim_row["2"],
-                    stim_row["3"], stim_row["4"],
-                    stim_row["5"], stim_row["6"]
-                ]
-
-                # IMPORTANT: convert unordered stim → pairs
-                stim_pairs = {
-                    "1": (stim_times_list[0], stim_times_list[1]),
-                    "3": (stim_times_list[2], stim_times_list[3]),
-                    "5": (stim_times_list[4], stim_times_list[5]),
-                }
-
-                _cut_movies(
-                    snirf_path=movie_path,
-                    stim_times=[
-                        stim_pairs["1"][0], stim_pairs["1"][1],
-                        stim_pairs["3"][0], stim_pairs["3"][1],
-                        stim_pairs["5"][0], stim_pairs["5"][1],
-                    ],
-                    dyad_id=dyad_id,
-                    is_child=is_child,
-                    external_structure=external_structure,
-                    snirf_goal_structure=snirf_goal_structure
-                )
-            else:
-                print(f"[WARN] missing movies for {dyad_id}")
-
-            # -------------------------------------------------
-            # 2. COPY FC1 / FC2 WHOLE FILES
-            # -------------------------------------------------
-            paths = _resolve_path(
-                dyad_id,
-                external_structure,
-                role="child" if is_child else "caregiver"
-            )
-            base_path = paths["full_dir"]
-
-            for fc_key in ["fc1", "fc2"]:
-
-                fc_path = row.get(fc_key, None)
-
-                if not isinstance(fc_path, str) or not os.path.exists(fc_path):
-                    continue
-
-                paths = _resolve_path(
-                    dyad_id,
-                    external_structure,
-                    role="child" if is_child else "caregiver",
-                    file_key=fc_key
-                )
+    if workers <= 1:
+        for job in jobs:
+            segmentation.run_segments(**job["kwargs"])
+        return None
 
-                out_path = paths["file_path"]
+    # -------------------------------------------------
+    # parallel
+    # -------------------------------------------------
+    t0 = time.perf_counter()
+    results = []
 
-                os.makedirs(base_path, exist_ok=True)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_run_cut_job, job) for job in jobs]
+        for future in as_completed(futures):
+            results.append(future.result())
 
-                shutil.copy2(fc_path, out_path)
-                print(f"[FC COPY] {dyad_id} {fc_key} → {out_path}")
+    _print_cut_summary(results, time.perf_counter() - t0)
 
-    # -------------------------------------------------
-    # run both roles
-    # -------------------------------------------------
-    process_table(paths_children, is_child=True)
-    process_table(paths_caregivers, is_child=False)
+    return results
 
 if __name__ == "__main__":
     """
@@ -559,15 +523,17 @@ if __name__ == "__main__":
         external_structure=conf.EXTERNAL_STRUCTURE
     )
 
-    cgs_df, _ = snirf.create_meta_df(conf.SNIRF_DIR_CAREGIVER)
-    cls_df, _ = snirf.create_meta_df(conf.SNIRF_DIR_CHILD)
+    meta = snirf.create_meta_dfs()
+    cgs_df, _ = meta["caregiver"]
+    cls_df, _ = meta["child"]
 
     merge_df = snirf.merge_meta(caregiver_df=cgs_df, child_df=cls_df)
 
     stim_time_df = snirf.extract_movies_stim_info(
         meta_df=merge_df,
         snirf_dir_child=conf.SNIRF_DIR_CHILD,
-        snirf_dir_caregiver=conf.SNIRF_DIR_CAREGIVER
+        snirf_dir_caregiver=conf.SNIRF_DIR_CAREGIVER,
+        workers=os.cpu_count()
     )
 
     cut_all_movies(stim_df_input=stim_time_df)
\ No newline at end of file
@@ -0,0 +1,162 @@
+"""
+Loader of conf.EXTERNAL_STRUCTURE (external DB layout).
+
+Every "format" node is either a template string or (legacy) a callable
+taking the dyad id. Template fields:
+
+    {dyad_id}  -> W050
+    {letter}   -> W
+    {number}   -> 050
+
+compile_structure() flattens the nested dict once into a CompiledStructure
+(root / modality / dyad formats + per-role dir and file formats), cached by
+the dict's content, so a modified structure dict is compiled again. Template-only
+structures pickle as a handful of strings, so they can be shipped to process-pool
+workers (also with spawn on Windows); lambda-based dicts still work in-process.
+"""
+
+import os
+
+
+_ROLE_SUFFIX = "_dir"
+
+# frozen structure content -> CompiledStructure (oldest entry evicted first)
+_COMPILED_CACHE = {}
+_COMPILED_CACHE_SIZE = 16
+
+
+def dyad_fields(dyad_id):
+    return {"dyad_id": dyad_id, "letter": dyad_id[0], "number": dyad_id[1:]}
+
+
+def _format(fmt, dyad_id):
+    if callable(fmt):
+        return fmt(dyad_id)
+
+    return fmt.format(**dyad_fields(dyad_id))
+
+
+class CompiledStructure:
+    """
+    Flat form of an EXTERNAL_STRUCTURE dict.
+
+    roles: role -> (role dir format, {file_key: file format})
+    """
+    __slots__ = ("root", "modality", "dyad", "roles")
+
+    def __init__(self, root, modality, dyad, roles):
+        self.root = root
+        self.modality = modality
+        self.dyad = dyad
+        self.roles = roles
+
+    def file_keys(self, role):
+        return list(self.roles[role][1])
+
+    def dyad_dir(self, dyad_id):
+        return os.path.join(
+            _format(self.root, dyad_id),
+            _format(self.modality, dyad_id),
+            _format(self.dyad, dyad_id)
+        )
+
+    def role_dir(self, dyad_id, role):
+        return os.path.join(self.dyad_dir(dyad_id), _format(self.roles[role][0], dyad_id))
+
+    def file_name(self, dyad_id, role, file_key):
+        file_fmts = self.roles[role][1]
+        if file_key not in file_fmts:
+            raise ValueError(f"{file_key} not found in {role}{_ROLE_SUFFIX}")
+
+        return _format(file_fmts[file_key], dyad_id)
+
+    def file_path(self, dyad_id, role, file_key):
+        return os.path.join(self.role_dir(dyad_id, role), self.file_name(dyad_id, role, file_key))
+
+    def resolve(self, dyad_id, role=None, file_key=None):
+        """
+        Same dict as external_format._resolve_path:
+        root, modality, dyad, role (optional), full_dir, file_path (optional).
+        """
+        root_path = _format(self.root, dyad_id)
+        modality_path = os.path.join(root_path, _format(self.modality, dyad_id))
+        dyad_path = os.path.join(modality_path, _format(self.dyad, dyad_id))
+
+        result = {
+            "root": root_path,
+            "modality": modality_path,
+            "dyad": dyad_path
+        }
+
+        if role is None:
+            result["full_dir"] = dyad_path
+            return result
+
+        role_path = os.path.join(dyad_path, _format(self.roles[role][0], dyad_id))
+        result["role"] = role_path
+        result["full_dir"] = role_path
+
+        if file_key is not None:
+            result["file_path"] = os.path.join(role_path, self.file_name(dyad_id, role, file_key))
+
+        return result
+
+
+def _compile(external_structure):
+    root_struct = external_structure["root"]
+    modality_struct = root_struct["modality"]
+    dyad_struct = modality_struct["dyad"]
+
+    roles = {}
+    for key, role_struct in dyad_struct.items():
+        if not key.endswith(_ROLE_SUFFIX):
+            continue
+
+        roles[key[:-len(_ROLE_SUFFIX)]] = (
+            role_struct["format"],
+            {
+                file_key: file_struct["format"]
+                for file_key, file_struct in role_struct.items()
+                if file_key != "format"
+            }
+        )
+
+    return CompiledStructure(
+        root_struct["format"],
+        modality_struct["format"],
+        dyad_struct["format"],
+        roles
+    )
+
+
+def _freeze(struct):
+    """
+    Hashable content of a structure dict (callables compare by identity).
+    """
+    if isinstance(struct, dict):
+        return tuple((key, _freeze(value)) for key, value in struct.items())
+
+    return struct
+
+
+def compile_structure(external_structure):
+    """
+    CompiledStructure of an EXTERNAL_STRUCTURE dict (templates or lambdas),
+    or the argument itself if already compiled. Compiled once per content.
+    """
+    if isinstance(external_structure, CompiledStructure):
+        return external_structure
+
+    key = _freeze(external_structure)
+
+    compiled = _COMPILED_CACHE.get(key)
+    if compiled is not None:
+        return compiled
+
+    compiled = _compile(external_structure)
+
+    if len(_COMPILED_CACHE) >= _COMPILED_CACHE_SIZE:
+        del _COMPILED_CACHE[next(iter(_COMPILED_CACHE))]
+    _COMPILED_CACHE[key] = compiled
+
+    return compiled
@@ -0,0 +1,138 @@
+"""
+Placing whole SNIRF files into the internal / external DB layouts.
+
+Strategies:
+    hardlink - second name for the same file (same volume only, no extra space)
+    reflink  - copy-on-write clone (Btrfs/XFS/APFS/ReFS-like filesystems)
+    symlink  - link to the source path (may need privileges on Windows)
+    copy     - shutil.copy2
+
+A failing strategy falls back along FALLBACKS, ending with a plain copy.
+Hardlinked and symlinked files share data with the raw file: never modify
+them in place.
+"""
+
+import os
+import sys
+import shutil
+import subprocess
+
+
+PLACEMENT_STRATEGIES = ("hardlink", "reflink", "symlink", "copy")
+
+FALLBACKS = {
+    "hardlink": ["hardlink", "reflink", "copy"],
+    "reflink": ["reflink", "copy"],
+    "symlink": ["symlink", "copy"],
+    "copy": ["copy"]
+}
+
+# linux/fs.h: _IOW(0x94, 9, int)
+_FICLONE = 0x40049409
+
+
+def _reflink(src, dst):
+    if sys.platform.startswith("linux"):
+        import fcntl
+
+        with open(src, "rb") as f_src, open(dst, "wb") as f_dst:
+            try:
+                fcntl.ioctl(f_dst.fileno(), _FICLONE, f_src.fileno())
+            except OSError:
+                f_dst.close()
+                os.remove(dst)
+                raise
+        shutil.copystat(src, dst)
+        return
+
+    if sys.platform == "darwin":
+        result = subprocess.run(["cp", "-c", "-p", src, dst], capture_output=True)
+        if result.returncode != 0:
+            if os.path.exists(dst):
+                os.remove(dst)
+            raise OSError(result.stderr.decode(errors="replace").strip())
+        return
+
+    raise OSError(f"reflink not supported on {sys.platform}")
+
+
+def _place(src, dst, strategy):
+    if strategy == "hardlink":
+        os.link(src, dst)
+    elif strategy == "reflink":
+        _reflink(src, dst)
+    elif strategy == "symlink":
+        os.symlink(os.path.abspath(src), dst)
+    elif strategy == "copy":
+        shutil.copy2(src, dst)
+    else:
+        raise ValueError(f"unknown placement strategy: {strategy}")
+
+
+def verify_placement(src, dst, strategy):
+    """
+    Checks a placed file: same size, and for links the same underlying file.
+    """
+    if os.path.getsize(src) != os.path.getsize(dst):
+        raise OSError(f"size mismatch after {strategy}: {src} -> {dst}")
+
+    if strategy in ("hardlink", "symlink") and not os.path.samefile(src, dst):
+        raise OSError(f"{strategy} does not point to source: {src} -> {dst}")
+
+
+def is_placed(src, dst):
+    """
+    True if dst is an up-to-date placement of src: the same file (hardlink/symlink),
+    or equal size and mtime (copy/reflink; 2 s tolerance for FAT/exFAT drives).
+    """
+    if not os.path.exists(dst):
+        return False
+
+    if os.path.samefile(src, dst):
+        return True
+
+    src_st = os.stat(src)
+    dst_st = os.stat(dst)
+
+    return (
+        src_st.st_size == dst_st.st_size
+        and abs(src_st.st_mtime - dst_st.st_mtime) <= 2.0
+    )
+
+
+def place_file(src, dst, strategy="copy"):
+    """
+    Places src at dst with `strategy`, falling back along FALLBACKS.
+    An existing dst is replaced only after the new placement succeeded.
+
+    :return: strategy actually used
+    """
+    if strategy not in FALLBACKS:
+        raise ValueError(f"unknown placement strategy: {strategy}")
+
+    tmp_dst = f"{dst}.placing"
+    errors = []
+
+    for candidate in FALLBACKS[strategy]:
+        if os.path.lexists(tmp_dst):
+            os.remove(tmp_dst)
+
+        try:
+            _place(src, tmp_dst, candidate)
+            verify_placement(src, tmp_dst, candidate)
+        except OSError as e:
+            errors.append(f"{candidate}: {e}")
+            continue
+
+        os.replace(tmp_dst, dst)
+
+        # rename() is a no-op when tmp_dst and dst are hardlinks of the same file
+        if os.path.lexists(tmp_dst):
+            os.remove(tmp_dst)
+
+        return candidate
+
+    if os.path.lexists(tmp_dst):
+        os.remove(tmp_dst)
+
+    raise OSError(f"could not place {src} -> {dst} ({'; '.join(errors)})")
@@ -1,11 +1,11 @@
 import os
-import shutil
 import pandas as pd
 
 from data_handling.snirf_handling import create_meta_df
+from data_handling.file_placement import place_file
 import data_handling.config_handling as conf
 
-def create_internal_db_format(paths_df_child, paths_df_care, output_db_dir):
+def create_internal_db_format(paths_df_child, paths_df_care, output_db_dir, strategy=None):
     """
     Tworzy strukturę folderów:
     Wxxx/
@@ -13,9 +13,15 @@ def create_internal_db_format(paths_df_child, paths_df_care, output_db_dir):
             cg_mov.snirf, cg_fc1.snirf, cg_fc2.snirf
         child/
             ch_mov.snirf, ch_fc1.snirf, ch_fc2.snirf
-    i kopiuje odpowiednie pliki.
+    i umieszcza w niej odpowiednie pliki.
+
+    :param strategy: "hardlink" | "reflink" | "symlink" | "copy"
+                     (domyślnie conf.PLACEMENT_STRATEGY, patrz file_placement.py)
     """
 
+    if strategy is None:
+        strategy = conf.PLACEMENT_STRATEGY
+
     segments = ['movies', 'fc1', 'fc2']
 
     # upewnij się, że output_dir istnieje
@@ -42,7 +48,7 @@ def create_internal_db_format(paths_df_child, paths_df_care, output_db_dir):
                     ext = os.path.splitext(src_path)[1]
                     dst_name = f"ch_{seg}{ext}"
                     dst_path = os.path.join(child_folder, dst_name)
-                    shutil.copy2(src_path, dst_path)
+                    place_file(src_path, dst_path, strategy)
 
         # --- caregiver ---
         row_care = paths_df_care[paths_df_care["dyad_id"] == dyad_id]
@@ -54,7 +60,7 @@ def create_internal_db_format(paths_df_child, paths_df_care, output_db_dir):
                     ext = os.path.splitext(src_path)[1]
                     dst_name = f"cg_{seg}{ext}"
                     dst_path = os.path.join(care_folder, dst_name)
-                    shutil.copy2(src_path, dst_path)
+                    place_file(src_path, dst_path, strategy)
 
     print(f"Struktura snirfów utworzona w: {output_db_dir}")
 
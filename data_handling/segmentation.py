@@ -0,0 +1,674 @@
+"""
+Table-driven segment extraction.
+
+A segment table (see external_format.build_segment_table) has one row per
+output file:
+
+    dyad_id, role, label, mode, source_key, source, output,
+    start, stop, padding, stim_map
+
+mode == "cut"   -> [start - padding, stop + padding] is cut from `source`,
+                   time is rebased to `start`, stims are remapped by `stim_map`
+mode == "place" -> `source` is placed whole at `output` (file_placement)
+
+run_segments() handles the rows of one dyad × role; all "cut" rows of the
+same source are extracted by extract_segments() in a single open, with the
+sample windows of all segments resolved at once and every dataset read once.
+"""
+
+import os
+import json
+import hashlib
+
+import h5py
+import numpy as np
+
+import data_handling.config_handling as conf
+import data_handling.snirf_handling as snirf
+import data_handling.windowing as win
+import data_handling.snirf_model as model
+import data_handling.file_placement as placement
+
+
+# bump when the cut output format changes, so old outputs are re-cut
+CUT_FORMAT_VERSION = 3
+
+# per-sample members of metaDataTags: cut like data1/time, values kept
+# (sample_index is relative to hardware, device_timestamp has no offset);
+# first_timestamp is rebased like time
+META_SAMPLE_KEYS = ("missing_sample", "sample_index", "device_timestamp")
+
+
+# -------------------------------------------------
+# write profiles
+# -------------------------------------------------
+def _resolve_write_profile(write_profile=None):
+    """
+    Write profile dict from a name in conf.WRITE_PROFILES, a dict, or None (conf.WRITE_PROFILE).
+    """
+    if write_profile is None:
+        write_profile = conf.WRITE_PROFILE
+
+    if isinstance(write_profile, str):
+        if write_profile not in conf.WRITE_PROFILES:
+            raise ValueError(f"unknown write profile: {write_profile}")
+        write_profile = conf.WRITE_PROFILES[write_profile]
+
+    return write_profile
+
+
+def _dataset_kwargs(write_profile, shape):
+    """
+    h5py create_dataset kwargs (chunks, compression, shuffle) for a time-major array.
+    """
+    write_profile = _resolve_write_profile(write_profile)
+    chunk_time = write_profile.get("chunk_time")
+
+    if chunk_time is None or len(shape) == 0 or shape[0] == 0:
+        return {}
+
+    kwargs = {
+        "chunks": (min(chunk_time, shape[0]),) + tuple(shape[1:]),
+        "shuffle": bool(write_profile.get("shuffle", False))
+    }
+
+    if write_profile.get("compression") is not None:
+        kwargs["compression"] = write_profile["compression"]
+        if write_profile.get("compression_opts") is not None:
+            kwargs["compression_opts"] = write_profile["compression_opts"]
+
+    return kwargs
+
+
+# -------------------------------------------------
+# HDF5 helpers
+# -------------------------------------------------
+def _copy_static(src_grp, dst_grp, skip=()):
+    """
+    Copies members of src_grp (except `skip`) into dst_grp HDF5-to-HDF5,
+    together with the group attributes.
+
+    Datasets keep their dtypes, attributes and filters (compression);
+    nothing is decoded into Python objects.
+    """
+    for key, val in src_grp.attrs.items():
+        dst_grp.attrs[key] = val
+
+    for key in src_grp.keys():
+        if key in skip:
+            continue
+        src_grp.copy(src_grp[key], dst_grp, name=key)
+
+
+def _write_like(group, key, src_dataset, data, write_profile=None):
+    """
+    Writes `data` as group[key] with the dtype and attributes of src_dataset.
+    With write_profile, the dataset is chunked/compressed (see _dataset_kwargs);
+    otherwise it is written contiguous.
+    """
+    data = np.asarray(data, dtype=src_dataset.dtype)
+
+    kwargs = {}
+    if write_profile is not None:
+        kwargs = _dataset_kwargs(write_profile, data.shape)
+
+    dset = group.create_dataset(key, data=data, **kwargs)
+
+    for attr_key, attr_val in src_dataset.attrs.items():
+        dset.attrs[attr_key] = attr_val
+
+    return dset
+
+
+def _check_overlap(segments):
+    intervals = list(segments.values())
+
+    for i in range(len(intervals)):
+        for j in range(i + 1, len(intervals)):
+            a_start, a_end = intervals[i]
+            b_start, b_end = intervals[j]
+
+            if max(a_start, b_start) < min(a_end, b_end):
+                print("Warning: overlapping movie segments detected")
+
+
+def _row_bytes(dataset):
+    return dataset.dtype.itemsize * int(np.prod(dataset.shape[1:], dtype=np.int64))
+
+
+def _rows_per_chunk(dataset, ram_budget_bytes, write_profile=None):
+    """
+    Rows of `dataset` fitting in ram_budget_bytes (multiple of the output chunk length).
+    """
+    rows = max(1, ram_budget_bytes // max(1, _row_bytes(dataset)))
+
+    chunk_time = write_profile.get("chunk_time") if write_profile is not None else None
+    if chunk_time and rows > chunk_time:
+        rows -= rows % chunk_time
+
+    return int(rows)
+
+
+def _stream_like(group, key, src_dataset, window, ram_budget_bytes, shift=None, write_profile=None):
+    """
+    Copies rows `window` of src_dataset to group[key] in time chunks of at most
+    ram_budget_bytes (minus `shift`, if given), keeping dtype and attributes.
+    """
+    n = win.window_length(window)
+    shape = (n,) + tuple(src_dataset.shape[1:])
+
+    kwargs = {}
+    if write_profile is not None:
+        kwargs = _dataset_kwargs(write_profile, shape)
+
+    dset = group.create_dataset(key, shape=shape, dtype=src_dataset.dtype, **kwargs)
+
+    for attr_key, attr_val in src_dataset.attrs.items():
+        dset.attrs[attr_key] = attr_val
+
+    step = _rows_per_chunk(src_dataset, ram_budget_bytes, write_profile)
+
+    for a in range(0, n, step):
+        b = min(a + step, n)
+
+        if isinstance(window, slice):
+            rows = src_dataset[window.start + a:window.start + b]
+        else:
+            rows = src_dataset[window[a:b]]
+
+        if shift is not None:
+            rows = rows - shift
+
+        dset[a:b] = rows
+
+    return dset
+
+
+def _write_rows(group, key, src_grp, window, block, ram_budget_bytes, shift=None, write_profile=None):
+    """
+    Writes rows `window` of src_grp[key]: from a pre-read (block, offset),
+    or streamed from the source when block is None.
+    """
+    if win.window_length(window) == 0:
+        src_dataset = src_grp[key]
+        return _write_like(group, key, src_dataset, np.empty((0,) + tuple(src_dataset.shape[1:])))
+
+    if block is None:
+        return _stream_like(
+            group, key, src_grp[key], window, ram_budget_bytes,
+            shift=shift, write_profile=write_profile
+        )
+
+    data, offset = block
+    rows = data[win.shift_window(window, offset)]
+
+    if shift is not None:
+        rows = rows - shift
+
+    return _write_like(group, key, src_grp[key], rows, write_profile=write_profile)
+
+
+def _write_time(group, src_grp, window, block, ram_budget_bytes, t_start, compact_time=False,
+                grid=None):
+    """
+    Writes the time of rows `window` rebased to t_start. With compact_time, a
+    uniformly sampled segment is written in the SNIRF two-element form [t0, dt].
+
+    grid: clock of a source stored in the compact form (rows come from the grid)
+    """
+    if grid is not None:
+        i0, i1 = win.window_bounds(window) or (0, 0)
+        if compact_time and i1 - i0 > 2:
+            return _write_like(
+                group, "time", src_grp["time"], [grid["t0"] + i0 * grid["dt"] - t_start, grid["dt"]]
+            )
+        rows = grid["t0"] + np.arange(i0, i1) * grid["dt"]
+        return _write_like(group, "time", src_grp["time"], rows - t_start)
+
+    if compact_time and win.window_length(window) > 2:
+        if block is None:
+            rows = src_grp["time"][window]
+        else:
+            data, offset = block
+            rows = data[win.shift_window(window, offset)]
+
+        grid = win.uniform_grid(rows)
+        if grid["uniform"]:
+            return _write_like(group, "time", src_grp["time"], [grid["t0"] - t_start, grid["dt"]])
+
+    return _write_rows(group, "time", src_grp, window, block, ram_budget_bytes, shift=t_start)
+
+
+def _clock(container):
+    """
+    (time, grid) of a time-based container; grid is its uniform or compact
+    [t0, dt] grid, or None for an irregular clock.
+    """
+    time = container["time"]
+    n_samples = container.shape("dataTimeSeries")[0] if "dataTimeSeries" in container else np.size(time)
+
+    if win.is_compact_time(time, n_samples):
+        return time, win.compact_grid(time, n_samples)
+
+    grid = win.uniform_grid(time)
+    return time, grid if grid["uniform"] else None
+
+
+def _clock_windows(time, grid, starts, stops, paddings):
+    """
+    Sample windows of all segments on one clock: O(1) per segment on a grid
+    (windowing.grid_window, edges snapped to stored samples), searchsorted on
+    an irregular time vector.
+    """
+    if grid is not None:
+        # compact [t0, dt] time: the grid is exact
+        stored = None if win.is_compact_time(time, grid["n"]) else time
+        return [
+            win.grid_window(grid, t_start, t_end, padding, time_array=stored)
+            for t_start, t_end, padding in zip(starts, stops, paddings)
+        ]
+
+    return win.time_windows(time, starts, stops, paddings)
+
+
+def _union_bounds(windows):
+    """
+    (lo, hi) rows covering all non-empty windows ((0, 0) if all are empty).
+    """
+    bounds = [win.window_bounds(window) for window in windows if win.window_length(window) > 0]
+    if not bounds:
+        return 0, 0
+
+    return min(b[0] for b in bounds), max(b[1] for b in bounds)
+
+
+def _read_union(container, key, windows):
+    """
+    Reads the rows covering all `windows` of container[key] in one hyperslab read.
+
+    Returns (block, offset of block row 0 in the dataset).
+    """
+    lo, hi = _union_bounds(windows)
+
+    return container.read(key, np.s_[lo:hi]), lo
+
+
+# -------------------------------------------------
+# fingerprints
+# -------------------------------------------------
+def segment_fingerprint(segment, snirf_goal_structure, write_profile=None, compact_time=False):
+    """
+    Fingerprint of one cut output: source file (size, mtime), label, start/stop,
+    padding, stim_map, SNIRF_GOAL_STRUCTURE, write profile, time encoding
+    and CUT_FORMAT_VERSION.
+
+    Returns (fingerprint hex, fingerprint json).
+    """
+    st = os.stat(segment["source"])
+
+    payload = json.dumps({
+        "version": CUT_FORMAT_VERSION,
+        "source": os.path.basename(segment["source"]),
+        "source_size": st.st_size,
+        "source_mtime_ns": st.st_mtime_ns,
+        "label": segment["label"],
+        "t_start": float(segment["start"]),
+        "t_end": float(segment["stop"]),
+        "padding": float(segment["padding"]),
+        "stim_map": sorted((segment["stim_map"] or {}).items()),
+        "goal_structure": sorted(snirf_goal_structure.items()),
+        "write_profile": _resolve_write_profile(write_profile),
+        "compact_time": bool(compact_time)
+    }, sort_keys=True)
+
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest(), payload
+
+
+def output_fingerprint(output_path):
+    """
+    Fingerprint stored in an existing output file (None if missing/unreadable).
+    """
+    if not os.path.exists(output_path):
+        return None
+
+    try:
+        with h5py.File(output_path, "r") as f:
+            fingerprint = f.attrs.get("fingerprint")
+    except OSError:
+        return None
+
+    if isinstance(fingerprint, bytes):
+        fingerprint = fingerprint.decode("utf-8")
+
+    return fingerprint
+
+
+# -------------------------------------------------
+# extraction
+# -------------------------------------------------
+def _write_segment(out_path, segment, windows, nirs, blocks, snirf_goal_structure,
+                   write_profile, fingerprint, ram_budget_bytes, compact_time=False,
+                   compact_grids=None):
+    """
+    Writes one cut segment.
+
+    windows: container name -> sample window of this segment in that container
+    blocks: container name -> {dataset key -> (block, offset) or None}
+            for time-based datasets and metaDataTags per-sample keys;
+            None means the dataset is streamed from the source.
+    compact_grids: container name -> grid of sources with compact [t0, dt] time
+    """
+    compact_grids = compact_grids or {}
+    t_start = segment["start"]
+
+    with h5py.File(out_path, "w") as out_f:
+        nirs_grp = out_f.create_group("nirs")
+        written_any = False
+
+        # 1. PROCESS STANDARD CONTAINERS (Data, Aux, Meta, Probe)
+        for container_name, keep in snirf_goal_structure.items():
+            if not keep or container_name not in nirs:
+                continue
+
+            container = nirs[container_name]
+            src_grp = container.h5
+
+            # Metadata logic
+            if container_name == "metaDataTags":
+                grp = nirs_grp.create_group("metaDataTags")
+                for k, block in blocks[container_name].items():
+                    _write_rows(grp, k, src_grp, windows[container_name], block, ram_budget_bytes)
+                if "first_timestamp" in container:
+                    _write_like(
+                        grp, "first_timestamp", src_grp["first_timestamp"],
+                        container["first_timestamp"] - t_start
+                    )
+                _copy_static(
+                    src_grp, grp,
+                    skip=list(blocks[container_name].keys()) + ["first_timestamp"]
+                )
+                written_any = True
+                continue
+
+            # Time-based containers (data1, aux1-6)
+            if container_name in blocks:
+                grp = nirs_grp.create_group(container_name)
+                window = windows[container_name]
+
+                _write_time(
+                    grp, src_grp, window, blocks[container_name]["time"],
+                    ram_budget_bytes, t_start, compact_time,
+                    grid=compact_grids.get(container_name)
+                )
+
+                if "dataTimeSeries" in blocks[container_name]:
+                    _write_rows(
+                        grp, "dataTimeSeries", src_grp, window,
+                        blocks[container_name]["dataTimeSeries"],
+                        ram_budget_bytes, write_profile=write_profile
+                    )
+
+                # measurementList*, name, ... copied natively
+                _copy_static(src_grp, grp, skip=("time", "dataTimeSeries"))
+                written_any = True
+                continue
+
+            # Probe/Static copy
+            out_f.copy(src_grp, nirs_grp, name=container_name)
+            written_any = True
+
+        # 2. PROCESS STIMULUS RE-MAPPING (e.g. stim3 -> stim1, stim4 -> stim2)
+        for src_key, target_key in (segment["stim_map"] or {}).items():
+            if src_key in nirs:
+                s_grp = nirs_grp.create_group(target_key)
+                src_grp = nirs[src_key].h5
+
+                if "data" in src_grp:
+                    # Re-base trigger time: t_new = t_old - t_start
+                    stim = model.read_stim(src_grp).shifted(-t_start)
+                    s_grp.create_dataset("data", data=stim.data)
+
+                _copy_static(src_grp, s_grp, skip=("data",))
+
+        # 3. FINGERPRINT (written last: an interrupted write is re-cut)
+        if written_any:
+            out_f.attrs["fingerprint"] = fingerprint[0]
+            out_f.attrs["fingerprint_json"] = fingerprint[1]
+
+    return written_any
+
+
+def extract_segments(source_path, segments, snirf_goal_structure, write_profile=None, force=False,
+                     ram_budget_mb=None, compact_time=None):
+    """
+    Cuts all `segments` (dict rows of a segment table, mode "cut") from one SNIRF.
+
+    The source is opened once and the sample windows of all segments are
+    resolved together per time-based container from its own clock (O(1)
+    windowing.grid_window on a uniform or compact [t0, dt] grid,
+    windowing.time_windows otherwise), so aux streams at another rate than data1 are cut on
+    their own clock; containers sharing data1's clock reuse its windows, and
+    metaDataTags per-sample keys follow data1. Every time-based dataset is
+    read once over the union of its windows.
+    If that union does not fit in ram_budget_mb (None -> conf.CUT_RAM_BUDGET_MB),
+    every dataset is streamed to the outputs in time chunks instead, so memory
+    stays flat regardless of recording length.
+    With compact_time (None -> conf.COMPACT_TIME), uniformly sampled time
+    vectors are written as [t0, dt].
+    Outputs with an unchanged fingerprint are skipped unless force=True.
+    """
+    if not segments:
+        return
+
+    write_profile = _resolve_write_profile(write_profile)
+    if compact_time is None:
+        compact_time = conf.COMPACT_TIME
+    if ram_budget_mb is None:
+        ram_budget_mb = conf.CUT_RAM_BUDGET_MB
+    ram_budget_bytes = int(ram_budget_mb * 1024 * 1024)
+    dyad_id = segments[0]["dyad_id"]
+
+    _check_overlap({seg["label"]: (seg["start"], seg["stop"]) for seg in segments})
+
+    # Outputs whose fingerprint changed (the source is not opened if none did)
+    pending = []
+
+    for seg in segments:
+        fingerprint = segment_fingerprint(seg, snirf_goal_structure, write_profile, compact_time)
+
+        if not force and output_fingerprint(seg["output"]) == fingerprint[0]:
+            print(f"[SKIP] up to date: {seg['output']}")
+            continue
+
+        pending.append((seg, fingerprint))
+
+    if not pending:
+        return
+
+    with h5py.File(source_path, "r") as f:
+        nirs = snirf.SnirfView(f).get("nirs", {})
+
+        # Reference time for indexing (read once for all segments)
+        ref_container = nirs.get("data1")
+        if ref_container is None or "time" not in ref_container:
+            print(f"[WARN] {dyad_id}: missing reference time")
+            return
+
+        ref_time, ref_grid = _clock(ref_container)
+        ref_windows = _clock_windows(
+            ref_time, ref_grid,
+            [seg["start"] for seg, _ in pending],
+            [seg["stop"] for seg, _ in pending],
+            [seg["padding"] for seg, _ in pending]
+        )
+
+        jobs = []
+        for (seg, fingerprint), window in zip(pending, ref_windows):
+            if window is None:
+                print(f"[WARN] {dyad_id} {seg['label']}: empty segment")
+                continue
+            jobs.append((seg, fingerprint, window))
+
+        if not jobs:
+            return
+
+        # Time-based datasets to cut
+        row_keys = {}
+        for container_name, keep in snirf_goal_structure.items():
+            if not keep or container_name not in nirs:
+                continue
+
+            container = nirs[container_name]
+
+            if container_name == "metaDataTags":
+                row_keys[container_name] = [key for key in META_SAMPLE_KEYS if key in container]
+            elif "time" in container:
+                row_keys[container_name] = [
+                    key for key in ("time", "dataTimeSeries") if key in container
+                ]
+
+        # (container, segment label) -> window; aux containers on data1's clock reuse its windows
+        ref_windows = [window for _, _, window in jobs]
+        windows = {}
+        compact_grids = {}
+
+        for container_name in row_keys:
+            clock_windows = ref_windows
+
+            if container_name == "data1":
+                if win.is_compact_time(ref_time, ref_grid["n"] if ref_grid else 0):
+                    compact_grids[container_name] = ref_grid
+            elif container_name != "metaDataTags":
+                container_time, container_grid = _clock(nirs[container_name])
+                if container_time.shape != ref_time.shape or not np.array_equal(container_time, ref_time):
+                    clock_windows = _clock_windows(
+                        container_time, container_grid,
+                        [seg["start"] for seg, _, _ in jobs],
+                        [seg["stop"] for seg, _, _ in jobs],
+                        [seg["padding"] for seg, _, _ in jobs]
+                    )
+                if win.is_compact_time(container_time, container_grid["n"] if container_grid else 0):
+                    compact_grids[container_name] = container_grid
+
+            for (seg, _, _), window in zip(jobs, clock_windows):
+                if window is None:
+                    print(f"[WARN] {dyad_id} {seg['label']}: no {container_name} samples")
+                    window = slice(0, 0)
+                windows[(container_name, seg["label"])] = window
+
+        job_windows = {
+            container_name: [windows[(container_name, seg["label"])] for seg, _, _ in jobs]
+            for container_name in row_keys
+        }
+
+        # One read per dataset covering all segments, if it fits in the RAM budget
+        union_bytes = 0
+        for container_name, keys in row_keys.items():
+            lo, hi = _union_bounds(job_windows[container_name])
+            union_bytes += sum((hi - lo) * _row_bytes(nirs[container_name].h5[key]) for key in keys)
+        streaming = union_bytes > ram_budget_bytes
+
+        blocks = {
+            container_name: {
+                key: None if streaming else _read_union(
+                    nirs[container_name], key, job_windows[container_name]
+                )
+                for key in keys
+            }
+            for container_name, keys in row_keys.items()
+        }
+
+        for seg, fingerprint, _ in jobs:
+            out_path = seg["output"]
+            os.makedirs(os.path.dirname(out_path), exist_ok=True)
+
+            seg_windows = {
+                container_name: windows[(container_name, seg["label"])]
+                for container_name in row_keys
+            }
+
+            written_any = _write_segment(
+                out_path, seg, seg_windows, nirs, blocks,
+                snirf_goal_structure, write_profile, fingerprint, ram_budget_bytes, compact_time,
+                compact_grids
+            )
+
+            if not written_any:
+                os.remove(out_path)
+            else:
+                print(f"Saved: {out_path}")
+
+
+def place_segment(segment, placement_strategy=None, force=False):
+    """
+    Places a whole-file segment (mode "place") at its output path.
+    """
+    if placement_strategy is None:
+        placement_strategy = conf.PLACEMENT_STRATEGY
+
+    out_path = segment["output"]
+
+    if not force and placement.is_placed(segment["source"], out_path):
+        print(f"[SKIP] up to date: {out_path}")
+        return
+
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+
+    used = placement.place_file(segment["source"], out_path, placement_strategy)
+    print(f"[{used.upper()}] {segment['dyad_id']} {segment['label']} → {out_path}")
+
+
+def _has_source(segment):
+    source = segment["source"]
+    return isinstance(source, str) and os.path.exists(source)
+
+
+def run_segments(
+        segments,
+        snirf_goal_structure=None,
+        write_profile=None,
+        placement_strategy=None,
+        force=False,
+        ram_budget_mb=None,
+        compact_time=None
+):
+    """
+    Runs the segment rows of one dyad × role: cut rows grouped by source
+    (one extract_segments call per source file), then whole-file placements.
+    """
+    if snirf_goal_structure is None:
+        snirf_goal_structure = conf.SNIRF_GOAL_STRUCTURE
+
+    cut_by_source = {}
+    warned = set()
+
+    for seg in segments:
+        if seg["mode"] != "cut":
+            continue
+
+        if not _has_source(seg):
+            warning = f"[WARN] missing {seg['source_key']} for {seg['dyad_id']}"
+        elif np.isnan(seg["start"]) or np.isnan(seg["stop"]):
+            warning = f"[WARN] missing stim for {seg['dyad_id']}"
+        else:
+            cut_by_source.setdefault(seg["source"], []).append(seg)
+            continue
+
+        if warning not in warned:
+            print(warning)
+            warned.add(warning)
+
+    for source_path, source_segments in cut_by_source.items():
+        extract_segments(
+            source_path,
+            source_segments,
+            snirf_goal_structure,
+            write_profile=write_profile,
+            force=force,
+            ram_budget_mb=ram_budget_mb,
+            compact_time=compact_time
+        )
+
+    for seg in segments:
+        if seg["mode"] == "place" and _has_source(seg):
+            place_segment(seg, placement_strategy, force=force)
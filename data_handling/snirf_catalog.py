@@ -0,0 +1,375 @@
+"""
+Persistent SQLite catalog of the raw SNIRF corpus.
+
+Per file it stores path, size, mtime, content hash, sampling rate,
+n_samples, t_min/t_max, channel count, wavelengths and all stimN
+name/onset rows. refresh_catalog() re-reads only files whose size or
+mtime changed, so meta_comp.csv, meta_stim_time.csv and the padding
+report become queries instead of corpus rescans.
+"""
+
+import os
+import json
+import sqlite3
+import hashlib
+
+import h5py
+import numpy as np
+import pandas as pd
+
+import data_handling.config_handling as conf
+import data_handling.snirf_handling as snirf
+import data_handling.windowing as win
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT NOT NULL,
+    dyad_id TEXT NOT NULL,
+    role TEXT NOT NULL,
+    segment TEXT NOT NULL,
+    dir_order INTEGER NOT NULL,
+    is_snirf INTEGER NOT NULL,
+    size INTEGER,
+    mtime_ns INTEGER,
+    sha1 TEXT,
+    fs REAL,
+    n_samples INTEGER,
+    t_min REAL,
+    t_max REAL,
+    n_channels INTEGER,
+    wavelengths TEXT,
+    error TEXT,
+    PRIMARY KEY (path, segment)
+);
+CREATE TABLE IF NOT EXISTS stims (
+    path TEXT NOT NULL,
+    stim_index INTEGER NOT NULL,
+    stim_key TEXT NOT NULL,
+    name TEXT,
+    row INTEGER NOT NULL,
+    onset REAL,
+    duration REAL,
+    value REAL
+);
+CREATE INDEX IF NOT EXISTS stims_path ON stims (path);
+CREATE INDEX IF NOT EXISTS files_dyad ON files (dyad_id, role, segment);
+"""
+
+# PRAGMA user_version of the current schema; older catalogs are rebuilt
+# (v1: files keyed by path only, one row per file even if it matches several segments)
+_SCHEMA_VERSION = 2
+
+_HASH_CHUNK = 1 << 20
+
+
+def _connect(db_path):
+    con = sqlite3.connect(db_path)
+
+    if con.execute("PRAGMA user_version").fetchone()[0] < _SCHEMA_VERSION:
+        con.executescript("DROP TABLE IF EXISTS files; DROP TABLE IF EXISTS stims;")
+        con.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
+
+    con.executescript(_SCHEMA)
+    return con
+
+
+def _file_hash(path):
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _read_snirf_meta(path):
+    """
+    Reads catalog fields from one SNIRF (time vector, shapes, probe, stims only).
+
+    Returns:
+        file_fields: dict of files-table columns
+        stim_rows: list of stims-table rows (without path)
+    """
+    file_fields = {}
+    stim_rows = []
+
+    with h5py.File(path, "r") as f:
+        nirs = snirf.SnirfView(f).get("nirs", {})
+
+        data1 = nirs.get("data1", {})
+        if "time" in data1:
+            time = data1["time"]
+            extent = win.time_extent(time)
+            file_fields["n_samples"] = int(time.size)
+            if extent is not None:
+                file_fields["t_min"] = float(extent[0])
+                file_fields["t_max"] = float(extent[1])
+            if time.size > 1:
+                file_fields["fs"] = float(1.0 / np.median(np.diff(time)))
+
+        if "dataTimeSeries" in data1:
+            shape = data1.shape("dataTimeSeries")
+            file_fields["n_channels"] = int(shape[1]) if len(shape) > 1 else 1
+
+        probe = nirs.get("probe", {})
+        if "wavelengths" in probe:
+            wavelengths = np.atleast_1d(probe["wavelengths"]).tolist()
+            file_fields["wavelengths"] = json.dumps(wavelengths)
+
+        for stim_key in nirs.keys():
+            if not stim_key.startswith("stim"):
+                continue
+
+            stim = nirs[stim_key]
+            stim_index = int(stim_key[4:]) if stim_key[4:].isdigit() else 0
+            name = stim.get("name", stim_key)
+            data = stim.get("data", None)
+
+            if not isinstance(data, np.ndarray) or data.size == 0:
+                stim_rows.append((stim_index, stim_key, str(name), 0, None, None, None))
+                continue
+
+            data = np.atleast_2d(data)
+            for i_row, stim_row in enumerate(data):
+                values = [float(x) for x in stim_row[:3]] + [None] * (3 - min(3, stim_row.size))
+                stim_rows.append((stim_index, stim_key, str(name), i_row, *values))
+
+    return file_fields, stim_rows
+
+
+def refresh_catalog(
+        db_path=None,
+        snirf_dir_child=None,
+        snirf_dir_caregiver=None,
+        hash_files=True
+):
+    """
+    Brings the catalog up to date with the raw folders.
+
+    Only new files and files whose size/mtime changed are opened (and hashed),
+    once even if the name matches several segments (one files row per
+    path × segment); rows of files that disappeared are removed.
+
+    :return: number of (re)read files
+    """
+    db_path = db_path or conf.SNIRF_CATALOG
+    folders = {
+        "child": snirf_dir_child or conf.SNIRF_DIR_CHILD,
+        "caregiver": snirf_dir_caregiver or conf.SNIRF_DIR_CAREGIVER
+    }
+
+    con = _connect(db_path)
+    known = {
+        path: (size, mtime_ns)
+        for path, size, mtime_ns in con.execute("SELECT DISTINCT path, size, mtime_ns FROM files")
+    }
+
+    seen = set()
+    # path -> (fields, error) of files read in this refresh
+    read = {}
+    n_read = 0
+
+    with con:
+        for role, folder in folders.items():
+            entries = snirf.index_snirf_dir(folder)
+
+            for dir_order, (dyad_id, seg, filename, is_snirf) in enumerate(entries):
+                path = os.path.join(folder, filename)
+                seen.add(path)
+
+                st = os.stat(path)
+                if known.get(path) == (st.st_size, st.st_mtime_ns):
+                    con.execute(
+                        "UPDATE files SET dir_order = ? WHERE path = ? AND segment = ?",
+                        (dir_order, path, seg)
+                    )
+                    continue
+
+                if path not in read:
+                    fields = {}
+                    stim_rows = []
+                    error = None
+
+                    if is_snirf:
+                        try:
+                            fields, stim_rows = _read_snirf_meta(path)
+                            if hash_files:
+                                fields["sha1"] = _file_hash(path)
+                        except Exception as e:
+                            error = f"{type(e).__name__}: {e}"
+
+                    read[path] = (fields, error)
+
+                    con.execute("DELETE FROM files WHERE path = ?", (path,))
+                    con.execute("DELETE FROM stims WHERE path = ?", (path,))
+                    con.executemany(
+                        "INSERT INTO stims (path, stim_index, stim_key, name, row, onset, duration, value) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                        [(path, *stim_row) for stim_row in stim_rows]
+                    )
+
+                    if error is not None:
+                        print(f"[WARN] catalog: cannot read {path}: {error}")
+                    n_read += 1
+
+                fields, error = read[path]
+                con.execute(
+                    "INSERT OR REPLACE INTO files "
+                    "(path, dyad_id, role, segment, dir_order, is_snirf, size, mtime_ns, sha1, "
+                    "fs, n_samples, t_min, t_max, n_channels, wavelengths, error) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        path, dyad_id, role, seg, dir_order, int(is_snirf),
+                        st.st_size, st.st_mtime_ns, fields.get("sha1"),
+                        fields.get("fs"), fields.get("n_samples"),
+                        fields.get("t_min"), fields.get("t_max"),
+                        fields.get("n_channels"), fields.get("wavelengths"),
+                        error
+                    )
+                )
+
+        for path in set(known) - seen:
+            con.execute("DELETE FROM files WHERE path = ?", (path,))
+            con.execute("DELETE FROM stims WHERE path = ?", (path,))
+
+    con.close()
+
+    return n_read
+
+
+def _sort_by_dyad(df):
+    df["dyad_num"] = df["dyad_id"].str.extract(r'(\d+)').astype(int)
+    return (
+        df
+        .sort_values("dyad_num")
+        .drop(columns="dyad_num")
+        .reset_index(drop=True)
+    )
+
+
+def catalog_meta_comp(db_path=None, output_path=None):
+    """
+    Completeness table equal to merge_meta(create_meta_df(child), create_meta_df(caregiver)):
+    dyad_id, movies_child, fc1_child, fc2_child, movies_care, fc1_care, fc2_care
+    (1 -> .snirf, 2 -> other segment file, 0 -> none).
+    """
+    con = _connect(db_path or conf.SNIRF_CATALOG)
+    df = pd.read_sql_query(
+        "SELECT dyad_id, role, segment, MAX(CASE WHEN is_snirf = 1 THEN 1 ELSE 2 END) AS status "
+        "FROM files GROUP BY dyad_id, role, segment",
+        con
+    )
+    con.close()
+
+    suffix = {"child": "child", "caregiver": "care"}
+    df["column"] = df["segment"] + "_" + df["role"].map(suffix)
+
+    columns = [f"{seg}_{suffix[role]}" for role in ["child", "caregiver"] for seg in snirf.SEGMENTS]
+    comp_df = (
+        df.pivot(index="dyad_id", columns="column", values="status")
+        .reindex(columns=columns)
+        .fillna(0)
+        .astype(int)
+        .reset_index()
+    )
+    comp_df.columns.name = None
+    comp_df = _sort_by_dyad(comp_df)
+
+    if output_path is not None:
+        comp_df.to_csv(output_path, index=False)
+
+    return comp_df
+
+
+def _movies_sources(con):
+    """
+    Movies file used per dyad: first child .snirf, else first caregiver .snirf
+    (same choice as extract_movies_stim_info).
+    """
+    files = pd.read_sql_query(
+        "SELECT path, dyad_id, role, dir_order FROM files "
+        "WHERE segment = 'movies' AND is_snirf = 1",
+        con
+    )
+    files["role_order"] = files["role"].map({"child": 0, "caregiver": 1})
+    return (
+        files
+        .sort_values(["dyad_id", "role_order", "dir_order"])
+        .drop_duplicates("dyad_id")
+    )
+
+
+def catalog_stim_times(db_path=None, output_path=None):
+    """
+    Stim table equal to extract_movies_stim_info:
+    dyad_id | <stim1_name> | ... | <stim6_name> (first onset of stim1–stim6).
+    """
+    con = _connect(db_path or conf.SNIRF_CATALOG)
+    sources = _movies_sources(con)
+    stims = pd.read_sql_query(
+        "SELECT path, stim_index, name, onset FROM stims "
+        "WHERE row = 0 AND stim_index BETWEEN 1 AND 6",
+        con
+    )
+    con.close()
+
+    stims = stims.merge(sources[["path", "dyad_id"]], on="path")
+    stims = stims.sort_values(["dyad_id", "stim_index"])
+
+    name_order = stims.drop_duplicates("name").sort_values("stim_index")["name"].tolist()
+    stim_df = (
+        stims.pivot_table(index="dyad_id", columns="name", values="onset", aggfunc="first", dropna=False)
+        .reindex(index=sources["dyad_id"], columns=name_order)
+        .reset_index()
+    )
+    stim_df.columns.name = None
+    stim_df = _sort_by_dyad(stim_df)
+
+    if output_path is not None:
+        stim_df.to_csv(output_path, index=False)
+
+    return stim_df
+
+
+def catalog_padding_report(stim_times_path=None, db_path=None):
+    """
+    Same numbers as external_format.inspect_padding_availability, as a DataFrame:
+    dyad_id, role, before (first movie start - t_min), after (t_max - last movie end).
+    """
+    stim_df = pd.read_csv(stim_times_path or conf.STIM_TIME_FILE, sep=None, engine="python")
+
+    con = _connect(db_path or conf.SNIRF_CATALOG)
+    files = pd.read_sql_query(
+        "SELECT dyad_id, role, t_min, t_max, dir_order FROM files "
+        "WHERE segment = 'movies' AND is_snirf = 1 AND t_min IS NOT NULL",
+        con
+    )
+    con.close()
+
+    # create_meta_df keeps the last .snirf per dyad/segment
+    files = files.sort_values("dir_order").drop_duplicates(["dyad_id", "role"], keep="last")
+
+    starts = stim_df[["1", "3", "5"]].to_numpy(dtype=float)
+    ends = stim_df[["2", "4", "6"]].to_numpy(dtype=float)
+    first = np.argmin(starts, axis=1)
+    last = np.argmax(starts, axis=1)
+    rows = np.arange(len(stim_df))
+
+    bounds = pd.DataFrame({
+        "dyad_id": stim_df["dyad_id"],
+        "first_start": starts[rows, first],
+        "last_end": ends[rows, last]
+    })
+
+    report = files.merge(bounds, on="dyad_id", how="inner")
+    report["before"] = report["first_start"] - report["t_min"]
+    report["after"] = report["t_max"] - report["last_end"]
+    report["role_order"] = report["role"].map({"child": 0, "caregiver": 1})
+    report["dyad_num"] = report["dyad_id"].str.extract(r'(\d+)').astype(int)
+
+    return (
+        report
+        .sort_values(["role_order", "dyad_num"])
+        [["dyad_id", "role", "before", "after"]]
+        .reset_index(drop=True)
+    )
@@ -3,15 +3,146 @@ import numpy as np
 import pandas as pd
 import os
 import re
+import json
+import threading
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 
 import data_handling.config_handling as conf
+import data_handling.windowing as win
+import data_handling.snirf_model as model
+
+
+SEGMENTS = ['movies', 'fc1', 'fc2']
+
+_DYAD_PATTERN = re.compile(r'w[_]?(\d{3})', re.IGNORECASE)
+
+# in-process memo: folder -> (mtime_ns, entries)
+_DIR_INDEX_MEMO = {}
+
+# read-modify-write of the JSON index cache (folders scanned in threads)
+_DIR_INDEX_LOCK = threading.Lock()
+
+
+def _scan_snirf_dir(folder_path):
+    """
+    Jeden przebieg os.scandir po folderze.
+
+    Zwraca listę [dyad_id, segment, filename, is_snirf]
+    w kolejności zwracanej przez system plików.
+    """
+    entries = []
+
+    with os.scandir(folder_path) as it:
+        for entry in it:
+            if not entry.is_file():
+                continue
+
+            dyad_match = _DYAD_PATTERN.search(entry.name)
+            if not dyad_match:
+                continue
+
+            dyad_id = f"W{dyad_match.group(1)}"
+            lower_name = entry.name.lower()
+            is_snirf = os.path.splitext(lower_name)[1] == ".snirf"
+
+            for seg in SEGMENTS:
+                if seg in lower_name:
+                    entries.append([dyad_id, seg, entry.name, is_snirf])
+
+    return entries
+
+
+def _load_index_cache(cache_path):
+    if not os.path.isfile(cache_path):
+        return {}
+
+    try:
+        with open(cache_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def index_snirf_dir(folder_path, cache_path=None, use_cache=True):
+    """
+    Indeks plików segmentów w folderze (patrz _scan_snirf_dir).
+
+    Indeks jest zapisywany w cache_path (JSON, domyślnie conf.SNIRF_INDEX_CACHE)
+    i unieważniany, gdy zmieni się mtime folderu (dodanie/usunięcie/zmiana nazwy pliku).
+    """
+    if not use_cache:
+        return _scan_snirf_dir(folder_path)
+
+    folder_key = os.path.abspath(folder_path)
+    mtime_ns = os.stat(folder_path).st_mtime_ns
+
+    memo = _DIR_INDEX_MEMO.get(folder_key)
+    if memo is not None and memo[0] == mtime_ns:
+        return memo[1]
+
+    if cache_path is None:
+        cache_path = conf.SNIRF_INDEX_CACHE
+
+    with _DIR_INDEX_LOCK:
+        cache = _load_index_cache(cache_path)
+        cached = cache.get(folder_key)
+
+    if cached is not None and cached["mtime_ns"] == mtime_ns:
+        entries = cached["entries"]
+    else:
+        # skan poza blokadą: foldery skanowane równolegle nie czekają na siebie
+        entries = _scan_snirf_dir(folder_path)
+
+        with _DIR_INDEX_LOCK:
+            cache = _load_index_cache(cache_path)
+            cache[folder_key] = {"mtime_ns": mtime_ns, "entries": entries}
+            try:
+                with open(cache_path, "w", encoding="utf-8") as f:
+                    json.dump(cache, f)
+            except OSError as e:
+                print(f"[WARN] could not write directory index {cache_path}: {e}")
+
+    _DIR_INDEX_MEMO[folder_key] = (mtime_ns, entries)
+
+    return entries
+
+
+def snirf_dir_lookup(folder_path, cache_path=None):
+    """
+    (dyad_id, segment) -> ścieżka do pierwszego pliku .snirf w folderze.
+    """
+    lookup = {}
+
+    for dyad_id, seg, filename, is_snirf in index_snirf_dir(folder_path, cache_path):
+        if is_snirf and (dyad_id, seg) not in lookup:
+            lookup[(dyad_id, seg)] = os.path.join(folder_path, filename)
+
+    return lookup
+
+
+def build_raw_index(snirf_dir_child=None, snirf_dir_caregiver=None, cache_path=None):
+    """
+    (dyad_id, role, segment) -> ścieżka .snirf dla obu folderów surowych danych.
+    """
+    folders = {
+        "child": snirf_dir_child or conf.SNIRF_DIR_CHILD,
+        "caregiver": snirf_dir_caregiver or conf.SNIRF_DIR_CAREGIVER
+    }
+
+    index = {}
+    for role, folder in folders.items():
+        for (dyad_id, seg), path in snirf_dir_lookup(folder, cache_path).items():
+            index[(dyad_id, role, seg)] = path
+
+    return index
 
 
 def create_meta_df(
     folder_path,
     output_data_completeness=None,
-    output_data_paths=None
+    output_data_paths=None,
+    cache_path=None
 ):
     """
     Tworzy dwa DataFrame'y:
@@ -25,39 +156,23 @@ def create_meta_df(
        zawiera ścieżki do .snirf (tam gdzie completeness == 1)
 
     Oba mogą zostać zapisane opcjonalnie.
+    Lista plików pochodzi z indeksu folderu (index_snirf_dir).
     """
 
-    dyad_pattern = re.compile(r'w[_]?(\d{3})', re.IGNORECASE)
-    segments = ['movies', 'fc1', 'fc2']
+    segments = SEGMENTS
 
     completeness = defaultdict(lambda: {seg: 0 for seg in segments})
     paths = defaultdict(lambda: {seg: None for seg in segments})
 
-    for filename in os.listdir(folder_path):
+    for dyad_id, seg, filename, is_snirf in index_snirf_dir(folder_path, cache_path):
         filepath = os.path.join(folder_path, filename)
 
-        if not os.path.isfile(filepath):
-            continue
-
-        dyad_match = dyad_pattern.search(filename)
-        if not dyad_match:
-            continue
-
-        dyad_number = dyad_match.group(1)
-        dyad_id = f"W{dyad_number}"
-
-        lower_name = filename.lower()
-
-        for seg in segments:
-            if seg in lower_name:
-                ext = os.path.splitext(filename)[1].lower()
-
-                if ext == ".snirf":
-                    completeness[dyad_id][seg] = 1
-                    paths[dyad_id][seg] = filepath
-                else:
-                    if completeness[dyad_id][seg] != 1:
-                        completeness[dyad_id][seg] = 2
+        if is_snirf:
+            completeness[dyad_id][seg] = 1
+            paths[dyad_id][seg] = filepath
+        else:
+            if completeness[dyad_id][seg] != 1:
+                completeness[dyad_id][seg] = 2
 
     # ---- completeness DF ----
     completeness_df = pd.DataFrame.from_dict(completeness, orient='index')
@@ -86,6 +201,38 @@ def create_meta_df(
     return completeness_df, paths_df
 
 
+def create_meta_dfs(
+    snirf_dir_child=None,
+    snirf_dir_caregiver=None,
+    output_paths_child=None,
+    output_paths_caregiver=None,
+    cache_path=None
+):
+    """
+    create_meta_df dla folderu dzieci i opiekunów jednocześnie (dwa wątki):
+    skanowanie katalogów to głównie oczekiwanie na I/O (dyski sieciowe / USB).
+
+    Zwraca słownik: "child" / "caregiver" -> (completeness_df, paths_df).
+    """
+    jobs = {
+        "child": (snirf_dir_child or conf.SNIRF_DIR_CHILD, output_paths_child),
+        "caregiver": (snirf_dir_caregiver or conf.SNIRF_DIR_CAREGIVER, output_paths_caregiver)
+    }
+
+    with ThreadPoolExecutor(max_workers=len(jobs)) as executor:
+        futures = {
+            role: executor.submit(
+                create_meta_df,
+                folder_path,
+                output_data_paths=output_paths,
+                cache_path=cache_path
+            )
+            for role, (folder_path, output_paths) in jobs.items()
+        }
+
+        return {role: future.result() for role, future in futures.items()}
+
+
 def merge_meta(child_df, caregiver_df, output_path=None):
     """
     Łączy dwa DataFrame'y (child + caregiver) po dyad_id.
@@ -183,75 +330,209 @@ def h5_to_dict(obj):
     return d
 
 
+def _decode_value(data):
+    """
+    Decodes byte strings the same way h5_to_dict does.
+    """
+    if isinstance(data, bytes):
+        return data.decode('utf-8')
+    if isinstance(data, np.ndarray) and data.dtype.kind == 'S':
+        return np.char.decode(data, 'utf-8')
+    return data
+
+
+class SnirfView:
+    """
+    Lazy, dict-like view over an open h5py File/Group.
+
+    Key paths are the same as in the dict returned by h5_to_dict
+    (e.g. view["nirs"]["data1"]["time"], view["nirs"]["stim1"].get("name")),
+    but a dataset is read from disk only when it is indexed.
+    Subgroups are returned as further SnirfView objects.
+
+    The view is valid only while the underlying file is open.
+    """
+
+    def __init__(self, obj):
+        self._obj = obj
+
+    @property
+    def h5(self):
+        """Underlying h5py Group (for direct hyperslab reads)."""
+        return self._obj
+
+    def _attr_keys(self):
+        return [f"ATTR_{key}" for key in self._obj.attrs.keys()]
+
+    def keys(self):
+        return list(self._obj.keys()) + self._attr_keys()
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self._obj) + len(self._obj.attrs)
+
+    def __contains__(self, key):
+        if key.startswith("ATTR_"):
+            return key[5:] in self._obj.attrs
+        return key in self._obj
+
+    def __getitem__(self, key):
+        if key.startswith("ATTR_") and key[5:] in self._obj.attrs:
+            return _decode_value(self._obj.attrs[key[5:]])
+
+        item = self._obj[key]
+
+        if isinstance(item, h5py.Group):
+            return SnirfView(item)
+
+        if item.ndim == 0:
+            return _decode_value(item[()])
+        return _decode_value(item[:])
+
+    def get(self, key, default=None):
+        if key not in self:
+            return default
+        return self[key]
+
+    def read(self, key, selection=()):
+        """
+        Reads only `selection` (e.g. np.s_[i0:i1]) of dataset `key`
+        straight from HDF5 (hyperslab read).
+        """
+        return _decode_value(self._obj[key][selection])
+
+    def shape(self, key):
+        """Shape of dataset `key` without reading it."""
+        return self._obj[key].shape
+
+    def time_grid(self, missing_sample=None):
+        """
+        Siatka czasu kontenera z time (data1, auxN): (t0, dt, n), jitter, przerwy
+        (windowing.uniform_grid); dla zapisu kompaktowego [t0, dt] siatka dokładna.
+        """
+        time = self["time"]
+        n_samples = self.shape("dataTimeSeries")[0] if "dataTimeSeries" in self else np.size(time)
+
+        if win.is_compact_time(time, n_samples):
+            grid = win.compact_grid(time, n_samples)
+            if missing_sample is not None:
+                grid["n_missing"] = int(np.count_nonzero(missing_sample))
+            return grid
+
+        return win.uniform_grid(time, missing_sample=missing_sample)
+
+    def items(self):
+        for key in self.keys():
+            yield key, self[key]
+
+    def values(self):
+        for key in self.keys():
+            yield self[key]
+
+    def to_dict(self):
+        """Materializes the whole view (same result as h5_to_dict)."""
+        return h5_to_dict(self._obj)
+
+
+def _read_movies_stims(dyad_id, snirf_file_path):
+    """
+    Wiersz stim1–stim6 (pierwszy onset) jednego pliku movies.
+    Czytane są tylko grupy stim (snirf_model.Stim); None jeśli brak grupy nirs.
+    """
+    with h5py.File(snirf_file_path, "r") as f:
+        if "nirs" not in f:
+            return None
+
+        stims = model.read_stims(f["nirs"])
+
+    row_dict = {"dyad_id": dyad_id}
+
+    # 4️⃣ iteracja po stim1–stim6
+    for i in range(1, 7):
+        stim = stims.get(f"stim{i}")
+
+        if stim is not None:
+            row_dict[stim.name] = stim.first_onset
+
+    return row_dict
+
+
+def _read_movies_stims_job(job):
+    return _read_movies_stims(*job)
+
+
+def time_grids(snirf_path):
+    """
+    Kontener z time -> siatka czasu (SnirfView.time_grid); dla data1 z liczbą
+    próbek oznaczonych w metaDataTags/missing_sample.
+    """
+    grids = {}
+
+    with h5py.File(snirf_path, "r") as f:
+        nirs = SnirfView(f).get("nirs", {})
+        meta = nirs.get("metaDataTags", {})
+        missing_sample = meta.get("missing_sample", None)
+
+        for key, obj in nirs.h5.items():
+            if not isinstance(obj, h5py.Group) or "time" not in obj:
+                continue
+
+            grids[key] = nirs[key].time_grid(missing_sample if key == "data1" else None)
+
+    return grids
+
+
 def extract_movies_stim_info(
         meta_df,
         snirf_dir_child,
         snirf_dir_caregiver,
-        output_path=None
+        output_path=None,
+        workers=1
 ):
     """
     Ekstrahuje informacje o stim1–stim6 z segmentu movies
     i buduje DataFrame:
 
     dyad_id | <stim1_name> | ... | <stim6_name>
+
+    workers > 1: pliki czytane równolegle w puli procesów (h5py serializuje
+    wywołania HDF5 w obrębie procesu, więc wątki nie nakładają odczytów).
+    Kolejność wierszy jak przy workers=1.
     """
 
-    results = []
+    # indeks obu folderów budowany raz (zamiast listdir dla każdej diady)
+    raw_index = build_raw_index(snirf_dir_child, snirf_dir_caregiver)
+
+    jobs = []
 
     for _, row in meta_df.iterrows():
         dyad_id = row["dyad_id"]
-        dyad_number = dyad_id[1:]  # np. "095"
 
         snirf_file_path = None
 
         # 1️⃣ sprawdź child
         if row.get("movies_child", 0) == 1:
-            snirf_file_path = _find_movies_file(
-                snirf_dir_child,
-                dyad_number
-            )
+            snirf_file_path = raw_index.get((dyad_id, "child", "movies"))
 
         # 2️⃣ jeśli nie ma child, sprawdź caregiver
         elif row.get("movies_care", 0) == 1:
-            snirf_file_path = _find_movies_file(
-                snirf_dir_caregiver,
-                dyad_number
-            )
+            snirf_file_path = raw_index.get((dyad_id, "caregiver", "movies"))
 
         if snirf_file_path is None:
             continue
 
-        # 3️⃣ wczytaj snirf (HDF5)
-        with h5py.File(snirf_file_path, "r") as f:
-            snirf_dict = h5_to_dict(f)
-
-        if "nirs" not in snirf_dict:
-            continue
-
-        nirs = snirf_dict["nirs"]
-
-        row_dict = {"dyad_id": dyad_id}
+        jobs.append((dyad_id, snirf_file_path))
 
-        # 4️⃣ iteracja po stim1–stim6
-        for i in range(1, 7):
-            stim_key = f"stim{i}"
+    # 3️⃣ otwórz snirf (HDF5) - czytamy tylko grupy stim
+    if workers <= 1:
+        rows = [_read_movies_stims(*job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            rows = list(executor.map(_read_movies_stims_job, jobs, chunksize=4))
 
-            if stim_key not in nirs:
-                continue
-
-            stim = nirs[stim_key]
-
-            stim_name = stim.get("name", f"stim{i}")
-            stim_data = stim.get("data", None)
-
-            if isinstance(stim_data, np.ndarray) and stim_data.size > 0:
-                value = stim_data.flatten()[0]
-            else:
-                value = np.nan
-
-            row_dict[stim_name] = value
-
-        results.append(row_dict)
+    results = [row_dict for row_dict in rows if row_dict is not None]
 
     # 5️⃣ budowa DataFrame
     result_df = pd.DataFrame(results)
@@ -272,23 +553,6 @@ def extract_movies_stim_info(
     return result_df
 
 
-def _find_movies_file(folder, dyad_number):
-    """
-    Znajduje plik movies.snirf dla danej diady.
-    """
-    pattern = re.compile(rf"w[_]?{dyad_number}", re.IGNORECASE)
-
-    for fname in os.listdir(folder):
-        if (
-                pattern.search(fname)
-                and "movies" in fname.lower()
-                and fname.lower().endswith(".snirf")
-        ):
-            return os.path.join(folder, fname)
-
-    return None
-
-
 def create_movie_order_df(stim_df, output_path=None):
 
     results = []
@@ -337,33 +601,22 @@ def create_movie_order_df(stim_df, output_path=None):
 
 
 if __name__ == "__main__":
-    cgs_df, _ = create_meta_df(
-        folder_path=conf.SNIRF_DIR_CAREGIVER,
-        output_data_completeness=None,#conf.OUTPUT_COMP_CAREGIVER
-        output_data_paths=conf.OUTPUT_PATHS_CAREGIVER
-    )
+    from data_handling.snirf_catalog import refresh_catalog, catalog_meta_comp, catalog_stim_times
 
-    cls_df, _ = create_meta_df(
-        folder_path=conf.SNIRF_DIR_CHILD,
-        output_data_completeness=None,#conf.OUTPUT_COMP_CHILD
-        output_data_paths=conf.OUTPUT_PATHS_CHILD
+    # oba foldery skanowane jednocześnie
+    create_meta_dfs(
+        output_paths_child=conf.OUTPUT_PATHS_CHILD,
+        output_paths_caregiver=conf.OUTPUT_PATHS_CAREGIVER
     )
 
-    merge_df = merge_meta(
-        caregiver_df=cgs_df,
-        child_df=cls_df,
-        output_path=conf.COMP_MERGED
-    )
+    # katalog SQLite: otwierane są tylko nowe / zmienione pliki
+    refresh_catalog()
 
-    stim_time_df = extract_movies_stim_info(
-        meta_df=merge_df,
-        snirf_dir_child=conf.SNIRF_DIR_CHILD,
-        snirf_dir_caregiver=conf.SNIRF_DIR_CAREGIVER,
-        output_path=conf.STIM_TIME_FILE
-    )
+    catalog_meta_comp(output_path=conf.COMP_MERGED)
+
+    stim_time_df = catalog_stim_times(output_path=conf.STIM_TIME_FILE)
 
     create_movie_order_df(
         stim_df=stim_time_df,
         output_path=conf.STIM_ORDER_FILE
     )
-
@@ -0,0 +1,337 @@
+"""
+Typed in-memory SNIRF record.
+
+A Recording holds the /nirs group of one SNIRF file as slotted dataclasses
+with NumPy arrays inside, instead of the nested dicts (with ATTR_ keys) of
+snirf_handling.h5_to_dict:
+
+    Recording
+        format_version   str
+        data             {"data1": TimeSeries, ...}
+        aux              {"aux1": TimeSeries, ...}
+        stims            {"stim1": Stim, ...}
+        probe            Probe
+        meta             {metaDataTags key: value}
+
+Strings are decoded to str on load and written back as UTF-8. Members not
+listed above (e.g. extra /nirs groups) are not loaded.
+"""
+
+import re
+from dataclasses import dataclass, field
+
+import h5py
+import numpy as np
+
+import data_handling.windowing as win
+
+
+_NUMBERED = re.compile(r"^(data|aux|stim|measurementList)(\d+)$")
+
+PARTS = ("data", "aux", "stims", "probe", "meta")
+
+
+def _decode(value):
+    if isinstance(value, bytes):
+        return value.decode("utf-8")
+    if isinstance(value, np.ndarray) and value.dtype.kind in "SO":
+        return np.array([_decode(x) for x in value.ravel()], dtype=str).reshape(value.shape)
+    return value
+
+
+def _read(dataset):
+    return _decode(dataset[()])
+
+
+def _encode(value):
+    if isinstance(value, np.ndarray) and value.dtype.kind == "U":
+        return np.char.encode(value, "utf-8")
+    return value
+
+
+def _numbered(group, prefix):
+    """
+    Members prefixN of a group, ordered by N.
+    """
+    keys = []
+    for key in group.keys():
+        match = _NUMBERED.match(key)
+        if match and match.group(1) == prefix:
+            keys.append((int(match.group(2)), key))
+    return [key for _, key in sorted(keys)]
+
+
+# -------------------------------------------------
+# model
+# -------------------------------------------------
+@dataclass(slots=True)
+class TimeSeries:
+    """
+    dataN / auxN container.
+
+    time: (n,) or compact [t0, dt]
+    data: (n,) or (n, n_channels)
+    measurement_list: field -> (n_channels,) array (dataN only; -1 / "" if missing)
+    """
+    time: np.ndarray
+    data: np.ndarray
+    name: str | None = None
+    measurement_list: dict = field(default_factory=dict)
+
+    @property
+    def n_samples(self):
+        return self.data.shape[0]
+
+    @property
+    def n_channels(self):
+        return self.data.shape[1] if self.data.ndim > 1 else 1
+
+    @property
+    def is_compact(self):
+        return win.is_compact_time(self.time, self.n_samples)
+
+    def full_time(self):
+        return win.expand_time(self.time, self.n_samples)
+
+    def window(self, t_start, t_end, padding=0.0):
+        """
+        windowing.time_window on this container's time.
+        """
+        if self.is_compact:
+            return win.grid_window(win.compact_grid(self.time, self.n_samples), t_start, t_end, padding)
+        return win.time_window(self.time, t_start, t_end, padding)
+
+    def cut(self, window, t_start=0.0):
+        """
+        Samples of `window` with time rebased to t_start (a slice gives views of data).
+        """
+        return TimeSeries(
+            time=self.full_time()[window] - t_start,
+            data=self.data[window],
+            name=self.name,
+            measurement_list=self.measurement_list
+        )
+
+
+@dataclass(slots=True)
+class Stim:
+    """
+    stimN: data rows [onset, duration, amplitude, ...].
+    """
+    name: str
+    data: np.ndarray
+
+    @property
+    def onsets(self):
+        return self.data[:, 0] if self.data.size else np.empty(0)
+
+    @property
+    def first_onset(self):
+        return self.data[0, 0] if self.data.size else np.nan
+
+    def shifted(self, offset):
+        """
+        Copy with onsets moved by `offset` [s].
+        """
+        data = self.data.copy()
+        if data.size:
+            data[:, 0] += offset
+        return Stim(self.name, data)
+
+
+@dataclass(slots=True)
+class Probe:
+    """
+    /nirs/probe: wavelengths plus every other probe dataset by name.
+    """
+    wavelengths: np.ndarray
+    fields: dict = field(default_factory=dict)
+    attrs: dict = field(default_factory=dict)
+
+
+@dataclass(slots=True)
+class Recording:
+    format_version: str | None = None
+    data: dict = field(default_factory=dict)
+    aux: dict = field(default_factory=dict)
+    stims: dict = field(default_factory=dict)
+    probe: Probe | None = None
+    meta: dict = field(default_factory=dict)
+
+    def stim_by_name(self, name):
+        for stim in self.stims.values():
+            if stim.name == name:
+                return stim
+        return None
+
+    def first_onsets(self):
+        """
+        Stim name -> first onset (NaN for an empty stim).
+        """
+        return {stim.name: stim.first_onset for stim in self.stims.values()}
+
+
+# -------------------------------------------------
+# loader
+# -------------------------------------------------
+def read_measurement_list(group, n_channels):
+    """
+    field -> (n_channels,) array from measurementList1..N of a dataN group.
+    Numeric fields missing in a channel are -1, string fields "".
+    """
+    ml_keys = _numbered(group, "measurementList")
+    values = {}
+
+    for i_channel, key in enumerate(ml_keys[:n_channels]):
+        for name, dataset in group[key].items():
+            column = values.setdefault(name, [None] * n_channels)
+            column[i_channel] = _read(dataset)
+
+    fields = {}
+    for name, column in values.items():
+        if any(isinstance(v, str) for v in column):
+            fields[name] = np.array(["" if v is None else v for v in column], dtype=str)
+        else:
+            fields[name] = np.array([-1 if v is None else np.ravel(v)[0] for v in column])
+
+    return fields
+
+
+def read_time_series(group, with_measurement_list=True):
+    data = group["dataTimeSeries"][()]
+    name = _read(group["name"]) if "name" in group else None
+
+    measurement_list = {}
+    if with_measurement_list:
+        n_channels = data.shape[1] if data.ndim > 1 else 1
+        measurement_list = read_measurement_list(group, n_channels)
+
+    return TimeSeries(time=group["time"][()], data=data, name=name, measurement_list=measurement_list)
+
+
+def read_stim(group, default_name=None):
+    data = np.asarray(group["data"][()], dtype=float) if "data" in group else np.empty((0, 3))
+    if data.ndim == 1:
+        data = data.reshape(1, -1) if data.size else np.empty((0, 3))
+
+    name = _read(group["name"]) if "name" in group else default_name
+    return Stim(name, data)
+
+
+def read_probe(group):
+    fields = {key: _read(dataset) for key, dataset in group.items() if isinstance(dataset, h5py.Dataset)}
+    wavelengths = np.asarray(fields.pop("wavelengths", np.empty(0)))
+    attrs = {key: _decode(value) for key, value in group.attrs.items()}
+    return Probe(wavelengths, fields, attrs)
+
+
+def read_stims(nirs):
+    return {key: read_stim(nirs[key], default_name=key) for key in _numbered(nirs, "stim")}
+
+
+def read_recording(h5_file, parts=PARTS):
+    """
+    Recording of an open h5py File. `parts` limits what is read (see PARTS).
+    """
+    fv = h5_file.get("formatVersion")
+    recording = Recording(format_version=_read(fv) if fv is not None else None)
+
+    if "nirs" not in h5_file:
+        return recording
+
+    nirs = h5_file["nirs"]
+
+    if "data" in parts:
+        recording.data = {key: read_time_series(nirs[key]) for key in _numbered(nirs, "data")}
+    if "aux" in parts:
+        recording.aux = {
+            key: read_time_series(nirs[key], with_measurement_list=False)
+            for key in _numbered(nirs, "aux")
+        }
+    if "stims" in parts:
+        recording.stims = read_stims(nirs)
+    if "probe" in parts and "probe" in nirs:
+        recording.probe = read_probe(nirs["probe"])
+    if "meta" in parts and "metaDataTags" in nirs:
+        recording.meta = {key: _read(dataset) for key, dataset in nirs["metaDataTags"].items()}
+
+    return recording
+
+
+def load_recording(path, parts=PARTS):
+    """
+    Recording of a SNIRF file; e.g. parts=("stims",) reads only the stim groups.
+    """
+    with h5py.File(path, "r") as f:
+        return read_recording(f, parts)
+
+
+def load_stims(path):
+    """
+    stimN -> Stim of a SNIRF file ({} without /nirs).
+    """
+    with h5py.File(path, "r") as f:
+        if "nirs" not in f:
+            return {}
+        return read_stims(f["nirs"])
+
+
+# -------------------------------------------------
+# writer
+# -------------------------------------------------
+def write_time_series(group, series, dataset_kwargs=None):
+    """
+    :param dataset_kwargs: optional chunking/compression kwargs for dataTimeSeries
+    """
+    group.create_dataset("time", data=series.time)
+    group.create_dataset("dataTimeSeries", data=series.data, **(dataset_kwargs or {}))
+
+    if series.name is not None:
+        group.create_dataset("name", data=series.name)
+
+    for name, values in series.measurement_list.items():
+        for i_channel, value in enumerate(values):
+            if value == "" or (not isinstance(value, str) and value < 0):
+                continue
+            group.require_group(f"measurementList{i_channel + 1}").create_dataset(
+                name, data=value.item() if isinstance(value, np.generic) else value
+            )
+
+
+def write_stim(group, stim):
+    group.create_dataset("data", data=stim.data)
+    if stim.name is not None:
+        group.create_dataset("name", data=stim.name)
+
+
+def write_probe(group, probe):
+    group.create_dataset("wavelengths", data=probe.wavelengths)
+    for key, value in probe.fields.items():
+        group.create_dataset(key, data=_encode(value))
+    for key, value in probe.attrs.items():
+        group.attrs[key] = value
+
+
+def write_recording(recording, path, dataset_kwargs=None):
+    """
+    Writes a Recording as a SNIRF file (overwrites `path`).
+    """
+    with h5py.File(path, "w") as f:
+        if recording.format_version is not None:
+            f.create_dataset("formatVersion", data=recording.format_version)
+
+        nirs = f.create_group("nirs")
+
+        for key, series in {**recording.data, **recording.aux}.items():
+            write_time_series(nirs.create_group(key), series, dataset_kwargs)
+
+        for key, stim in recording.stims.items():
+            write_stim(nirs.create_group(key), stim)
+
+        if recording.probe is not None:
+            write_probe(nirs.create_group("probe"), recording.probe)
+
+        if recording.meta:
+            meta = nirs.create_group("metaDataTags")
+            for key, value in recording.meta.items():
+                meta.create_dataset(key, data=_encode(value))
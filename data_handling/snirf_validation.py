@@ -0,0 +1,320 @@
+"""
+Metadata-only validation of raw SNIRF files against conf.SNIRF_BASE_STRUCTURE.
+
+Each file is walked once with h5py visititems; only object types, shapes and
+dtypes are inspected (no dataset is read), so the whole corpus is checked in
+seconds and broken files can be skipped before cutting / QC.
+
+SNIRF_BASE_STRUCTURE conventions:
+    'dict'          -> HDF5 group
+    'str'           -> string dataset
+    'float'         -> numeric scalar (or single-element) dataset
+    'array'         -> numeric dataset
+    'other'         -> anything
+    key ending '_'  -> numbered members (measurementList_ -> measurementList1, ...),
+                       at least one required; 'other_' allows unlisted members
+
+nirs/stimN groups are required only in segment files cut by stim times
+(conf.SEGMENT_SPECS rows with a start column, i.e. movies).
+"""
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import h5py
+import numpy as np
+import pandas as pd
+
+import data_handling.config_handling as conf
+import data_handling.snirf_handling as snirf
+
+
+# spec type -> accepted object kinds
+_ACCEPTED_KINDS = {
+    "dict": {"dict"},
+    "str": {"str"},
+    "float": {"float"},
+    "array": {"array", "float"}
+}
+
+
+def _kind(obj):
+    if isinstance(obj, h5py.Group):
+        return "dict"
+
+    if h5py.check_string_dtype(obj.dtype) is not None or obj.dtype.kind in "SUO":
+        return "str"
+
+    if int(np.prod(obj.shape, dtype=np.int64)) == 1:
+        return "float"
+
+    return "array"
+
+
+def _collect_entries(h5_file):
+    """
+    path -> (kind, shape) of every object in the file (metadata only).
+    """
+    entries = {}
+
+    def visit(name, obj):
+        shape = obj.shape if isinstance(obj, h5py.Dataset) else None
+        entries[name] = (_kind(obj), shape)
+
+    h5_file.visititems(visit)
+
+    return entries
+
+
+def _children(entries, prefix):
+    start = f"{prefix}/" if prefix else ""
+    return [
+        name[len(start):] for name in entries
+        if name.startswith(start) and "/" not in name[len(start):]
+    ]
+
+
+def _check_member(entries, path, expected, issues, optional=()):
+    kind = entries[path][0]
+
+    if isinstance(expected, dict):
+        if kind != "dict":
+            issues.append(("error", path, f"expected group, found {kind}"))
+            return
+        _check_group(entries, path, expected, issues, optional)
+        return
+
+    if expected == "other":
+        return
+
+    if kind not in _ACCEPTED_KINDS.get(expected, {expected}):
+        issues.append(("error", path, f"expected {expected}, found {kind}"))
+
+
+def _check_group(entries, prefix, spec, issues, optional=()):
+    members = _children(entries, prefix)
+    covered = set()
+
+    for key, expected in spec.items():
+        if key == "other_":
+            continue
+
+        if key.endswith("_"):
+            stem = key[:-1]
+            matches = [
+                m for m in members
+                if m.startswith(stem) and m[len(stem):].isdigit()
+            ]
+            if not matches:
+                issues.append(("error", f"{prefix}/{stem}N".lstrip("/"), "missing"))
+            for m in matches:
+                _check_member(entries, f"{prefix}/{m}".lstrip("/"), expected, issues, optional)
+            covered.update(matches)
+            continue
+
+        path = f"{prefix}/{key}".lstrip("/")
+        if key not in members:
+            if path not in optional:
+                issues.append(("error", path, "missing"))
+            continue
+
+        _check_member(entries, path, expected, issues, optional)
+        covered.add(key)
+
+    if "other_" not in spec:
+        for m in sorted(set(members) - covered):
+            issues.append(("warning", f"{prefix}/{m}".lstrip("/"), "unexpected"))
+
+
+def _check_time_series(entries, issues):
+    """
+    Shape consistency of time-based containers: time vs dataTimeSeries rows
+    (or compact [t0, dt] time), data1 measurementList count vs dataTimeSeries columns.
+    """
+    for name, (kind, _) in entries.items():
+        if kind != "dict":
+            continue
+
+        time_entry = entries.get(f"{name}/time")
+        data_entry = entries.get(f"{name}/dataTimeSeries")
+        if time_entry is None or data_entry is None:
+            continue
+
+        time_shape, data_shape = time_entry[1], data_entry[1]
+        compact = bool(time_shape) and bool(data_shape) and time_shape[0] == 2 and data_shape[0] != 2
+        if not time_shape or not data_shape or (time_shape[0] != data_shape[0] and not compact):
+            issues.append((
+                "error", name,
+                f"time {time_shape} does not match dataTimeSeries {data_shape}"
+            ))
+            continue
+
+        n_channels = sum(
+            1 for m in _children(entries, name)
+            if m.startswith("measurementList") and m[len("measurementList"):].isdigit()
+        )
+        if n_channels and len(data_shape) > 1 and data_shape[1] != n_channels:
+            issues.append((
+                "warning", name,
+                f"{n_channels} measurementList groups for {data_shape[1]} channels"
+            ))
+
+
+def _stim_paths(structure):
+    return [f"nirs/{key}" for key in structure.get("nirs", {}) if key.startswith("stim")]
+
+
+def _stim_segments(segment_specs=None):
+    """
+    Raw segments whose files must carry stims (cut by stim times).
+    """
+    segment_specs = segment_specs or conf.SEGMENT_SPECS
+    return {spec["source"] for spec in segment_specs.values() if spec["start"] is not None}
+
+
+def validate_snirf(path, structure=None, require_stims=True):
+    """
+    Checks one SNIRF file against `structure` (None -> conf.SNIRF_BASE_STRUCTURE).
+    With require_stims=False, stimN groups of the structure may be missing.
+
+    :return: list of (severity, object path, message); severity "error" | "warning"
+    """
+    structure = structure or conf.SNIRF_BASE_STRUCTURE
+
+    try:
+        with h5py.File(path, "r") as f:
+            entries = _collect_entries(f)
+    except Exception as e:
+        return [("error", "", f"cannot open: {type(e).__name__}: {e}")]
+
+    optional = () if require_stims else set(_stim_paths(structure))
+
+    issues = []
+    _check_group(entries, "", structure, issues, optional)
+    _check_time_series(entries, issues)
+
+    return issues
+
+
+def _validate_job(job):
+    """
+    Process-pool entry point: one report row.
+    """
+    t0 = time.perf_counter()
+    issues = validate_snirf(job["path"], job["structure"], job["require_stims"])
+
+    n_errors = sum(1 for severity, _, _ in issues if severity == "error")
+    n_warnings = len(issues) - n_errors
+
+    if n_errors:
+        status = "error"
+    elif n_warnings:
+        status = "warn"
+    else:
+        status = "ok"
+
+    return {
+        "dyad_id": job["dyad_id"],
+        "role": job["role"],
+        "segment": job["segment"],
+        "path": job["path"],
+        "status": status,
+        "n_errors": n_errors,
+        "n_warnings": n_warnings,
+        "issues": "; ".join(f"[{severity}] {obj}: {msg}" for severity, obj, msg in issues),
+        "seconds": time.perf_counter() - t0
+    }
+
+
+def validate_corpus(
+        snirf_dir_child=None,
+        snirf_dir_caregiver=None,
+        structure=None,
+        workers=1,
+        output_path=None
+):
+    """
+    Validates every raw .snirf of the child / caregiver folders.
+
+    :param workers: number of processes (1 -> serial)
+    :param output_path: optional CSV report path
+    :return: DataFrame: dyad_id, role, segment, path, status, n_errors, n_warnings, issues, seconds
+    """
+    folders = {
+        "child": snirf_dir_child or conf.SNIRF_DIR_CHILD,
+        "caregiver": snirf_dir_caregiver or conf.SNIRF_DIR_CAREGIVER
+    }
+
+    stim_segments = _stim_segments()
+
+    jobs = [
+        {
+            "dyad_id": dyad_id,
+            "role": role,
+            "segment": seg,
+            "path": os.path.join(folder, filename),
+            "structure": structure or conf.SNIRF_BASE_STRUCTURE,
+            "require_stims": seg in stim_segments
+        }
+        for role, folder in folders.items()
+        for dyad_id, seg, filename, is_snirf in snirf.index_snirf_dir(folder)
+        if is_snirf
+    ]
+
+    t0 = time.perf_counter()
+
+    if workers <= 1:
+        rows = [_validate_job(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            rows = list(executor.map(_validate_job, jobs, chunksize=8))
+
+    report = pd.DataFrame(rows, columns=[
+        "dyad_id", "role", "segment", "path", "status",
+        "n_errors", "n_warnings", "issues", "seconds"
+    ])
+
+    if output_path is not None:
+        report.to_csv(output_path, index=False)
+
+    counts = report["status"].value_counts()
+    print(
+        " | ".join(f"{status}: {n}" for status, n in counts.items())
+        + f" | files: {len(report)} | wall time: {time.perf_counter() - t0:.1f}s"
+    )
+
+    return report
+
+
+def _errors(report):
+    if isinstance(report, str):
+        report = pd.read_csv(report)
+
+    return report[report["status"] == "error"]
+
+
+def invalid_paths(report):
+    """
+    Paths with at least one error in a validate_corpus report (DataFrame or CSV path).
+    """
+    return set(_errors(report)["path"])
+
+
+def invalid_sources(report):
+    """
+    (dyad_id, role, segment) of the raw files with at least one error in a
+    validate_corpus report, e.g. to skip the segment files cut from them.
+    """
+    errors = _errors(report)
+    return set(zip(errors["dyad_id"], errors["role"], errors["segment"]))
+
+
+if __name__ == "__main__":
+    report = validate_corpus(
+        workers=os.cpu_count(),
+        output_path=conf.SNIRF_VALIDATION_REPORT
+    )
+
+    for row in report[report["status"] != "ok"].itertuples():
+        print(f"{row.dyad_id} | {row.role} | {row.segment} | {row.status} | {row.issues}")
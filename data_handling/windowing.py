@@ -0,0 +1,262 @@
+"""
+Time windowing on SNIRF time vectors.
+
+SNIRF time vectors are monotonic, so a [t_min, t_max] window can be found
+with two binary searches and returned as a slice. Slicing a NumPy array
+with it gives a view (no copy), and slicing an h5py Dataset with it gives
+a hyperslab read.
+Non-monotonic clocks fall back to a boolean mask and an index array.
+
+Fixed-rate recordings can also be described by a uniform grid (t0, dt, n):
+time -> index is then O(1) arithmetic, and SNIRF allows storing such a time
+vector in the compact two-element form [t0, dt].
+"""
+
+import numpy as np
+
+
+# max |t - (t0 + i * dt)| accepted as uniform, relative to dt
+GRID_RTOL = 1e-3
+
+# a step longer than this many dt counts as a gap
+GAP_FACTOR = 1.5
+
+
+def is_monotonic(time_array):
+    """
+    True if time_array is non-decreasing.
+    """
+    time_array = np.asarray(time_array)
+
+    if time_array.size < 2:
+        return True
+
+    return bool(np.all(time_array[1:] >= time_array[:-1]))
+
+
+def time_window(time_array, t_start, t_end, padding=0.0, check_monotonic=True):
+    """
+    Finds samples with t_start - padding <= t <= t_end + padding.
+
+    Returns:
+        slice(i0, i1) for a monotonic time vector,
+        sorted index array for a non-monotonic one,
+        None if the window is empty.
+
+    :param check_monotonic: set to False to skip the O(n) monotonicity check
+                            when the caller already knows the clock is monotonic
+    """
+    time_array = np.asarray(time_array)
+
+    t_min = t_start - padding
+    t_max = t_end + padding
+
+    if check_monotonic and not is_monotonic(time_array):
+        return _mask_window(time_array, t_min, t_max)
+
+    i0 = int(np.searchsorted(time_array, t_min, side="left"))
+    i1 = int(np.searchsorted(time_array, t_max, side="right"))
+
+    if i1 <= i0:
+        return None
+
+    return slice(i0, i1)
+
+
+def window_bounds(window):
+    """
+    (i0, i1) covered by a window returned from time_window.
+    For an index array this is the enclosing range.
+    """
+    if window is None:
+        return None
+
+    if isinstance(window, slice):
+        return window.start, window.stop
+
+    return int(window[0]), int(window[-1]) + 1
+
+
+def window_length(window):
+    """
+    Number of samples selected by a window returned from time_window.
+    """
+    if window is None:
+        return 0
+
+    if isinstance(window, slice):
+        return window.stop - window.start
+
+    return len(window)
+
+
+def time_extent(time_array):
+    """
+    (t_min, t_max) of a time vector (first/last sample when it is monotonic),
+    or None if it is empty.
+    """
+    time_array = np.asarray(time_array)
+
+    if time_array.size == 0:
+        return None
+
+    if is_monotonic(time_array):
+        return time_array[0], time_array[-1]
+
+    return np.min(time_array), np.max(time_array)
+
+
+def time_windows(time_array, starts, stops, paddings=0.0):
+    """
+    Vectorized time_window for many segments of the same time vector:
+    one monotonicity check and two searchsorted calls for all segments.
+
+    Returns a list of windows (slice / index array / None), one per segment.
+    """
+    time_array = np.asarray(time_array)
+    starts = np.asarray(starts, dtype=float)
+    stops = np.asarray(stops, dtype=float)
+    paddings = np.broadcast_to(np.asarray(paddings, dtype=float), starts.shape)
+
+    if not is_monotonic(time_array):
+        return [
+            _mask_window(time_array, t_start - padding, t_end + padding)
+            for t_start, t_end, padding in zip(starts, stops, paddings)
+        ]
+
+    i0 = np.searchsorted(time_array, starts - paddings, side="left")
+    i1 = np.searchsorted(time_array, stops + paddings, side="right")
+
+    return [
+        slice(int(a), int(b)) if b > a else None
+        for a, b in zip(i0, i1)
+    ]
+
+
+def _mask_window(time_array, t_min, t_max):
+    indices = np.flatnonzero((time_array >= t_min) & (time_array <= t_max))
+    if indices.size == 0:
+        return None
+    return indices
+
+
+def shift_window(window, offset):
+    """
+    Window relative to a block read from row `offset` onwards.
+    """
+    if isinstance(window, slice):
+        return slice(window.start - offset, window.stop - offset)
+
+    return window - offset
+
+
+def is_compact_time(time_array, n_samples):
+    """
+    True if time_array is the SNIRF two-element [t0, dt] form for n_samples samples.
+    """
+    return np.size(time_array) == 2 and n_samples != 2
+
+
+def uniform_grid(time_array, rtol=GRID_RTOL, missing_sample=None):
+    """
+    Describes a time vector as a uniform grid t0 + i * dt.
+
+    Returns dict:
+        t0, dt, n     grid parameters (dt from the end points, or the median
+                      step when there are gaps)
+        jitter        max |t - (t0 + i * dt)| [s]
+        uniform       jitter <= rtol * dt and no gaps
+        gaps          number of steps longer than GAP_FACTOR * dt
+        n_missing     samples flagged in metaDataTags/missing_sample (if given)
+    """
+    time_array = np.asarray(time_array, dtype=float)
+    n = int(time_array.size)
+
+    grid = {"t0": float(time_array[0]) if n else np.nan, "dt": np.nan, "n": n,
+            "jitter": 0.0, "uniform": n > 0, "gaps": 0, "n_missing": 0}
+
+    if missing_sample is not None:
+        grid["n_missing"] = int(np.count_nonzero(missing_sample))
+
+    if n < 2:
+        return grid
+
+    steps = np.diff(time_array)
+    dt = float(np.median(steps))
+    gaps = int(np.count_nonzero(steps > GAP_FACTOR * dt))
+
+    if gaps == 0:
+        dt = float((time_array[-1] - time_array[0]) / (n - 1))
+
+    jitter = float(np.max(np.abs(time_array - (grid["t0"] + np.arange(n) * dt))))
+
+    grid.update(
+        dt=dt,
+        jitter=jitter,
+        gaps=gaps,
+        uniform=bool(gaps == 0 and dt > 0 and jitter <= rtol * dt)
+    )
+
+    return grid
+
+
+def compact_grid(time_array, n_samples):
+    """
+    Grid of a compact [t0, dt] time vector (exact, no jitter).
+    """
+    t0, dt = (float(x) for x in np.ravel(time_array))
+    return {"t0": t0, "dt": dt, "n": int(n_samples), "jitter": 0.0,
+            "uniform": True, "gaps": 0, "n_missing": 0}
+
+
+def grid_time(grid):
+    """
+    Full time vector of a grid.
+    """
+    return grid["t0"] + np.arange(grid["n"]) * grid["dt"]
+
+
+def expand_time(time_array, n_samples):
+    """
+    Full time vector, expanding the compact [t0, dt] form if needed.
+    """
+    if is_compact_time(time_array, n_samples):
+        return grid_time(compact_grid(time_array, n_samples))
+
+    return np.asarray(time_array)
+
+
+def grid_window(grid, t_start, t_end, padding=0.0, time_array=None):
+    """
+    time_window on a uniform grid in O(1): slice of samples with
+    t_start - padding <= t <= t_end + padding, or None if empty.
+
+    Exact for the compact [t0, dt] form. On a stored full vector the grid edges
+    can be one sample off (jitter, float rounding); pass it as time_array to
+    snap the edges to the stored samples (same window as time_window).
+    """
+    t_min = t_start - padding
+    t_max = t_end + padding
+
+    # tolerance for boundaries falling on a sample up to float rounding
+    eps = 1e-9
+
+    i0 = max(0, int(np.ceil((t_min - grid["t0"]) / grid["dt"] - eps)))
+    i1 = min(grid["n"], int(np.floor((t_max - grid["t0"]) / grid["dt"] + eps)) + 1)
+
+    if time_array is not None:
+        n = len(time_array)
+        i0, i1 = min(i0, n), max(min(i1, n), 0)
+        while i0 > 0 and time_array[i0 - 1] >= t_min:
+            i0 -= 1
+        while i0 < n and time_array[i0] < t_min:
+            i0 += 1
+        while i1 < n and time_array[i1] <= t_max:
+            i1 += 1
+        while i1 > 0 and time_array[i1 - 1] > t_max:
+            i1 -= 1
+
+    if i1 <= i0:
+        return None
+
+    return slice(i0, i1)
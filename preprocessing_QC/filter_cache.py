@@ -0,0 +1,72 @@
+"""
+Cached IIR filter design for QC.
+
+Filter coefficients are designed once per (fs, band, order, btype, ftype,
+ripple, attenuation) and returned as second-order sections (SOS); zero-phase
+filtering then runs along time for all channels / components in one call.
+Defaults are those of pyphysio IIRFilter (cheby1, order 3, 0.1 dB ripple,
+40 dB attenuation), so results match it up to rounding.
+
+The cache is per process; cache_stats() reports hits and misses, e.g. to
+check that a cohort run designs each filter only once.
+"""
+
+from functools import lru_cache
+
+import numpy as np
+from scipy.signal import iirfilter, sosfiltfilt
+
+
+# fs is rounded for the cache key: 1 / dt of files sampled at the same
+# rate differs in the last digits
+FS_DECIMALS = 6
+
+
+@lru_cache(maxsize=None)
+def _design(fs, band, order, btype, ftype, rp, rs):
+    wp = np.asarray(band, dtype=float) / (0.5 * fs)
+    if not (wp < 1).all():
+        raise ValueError(f"invalid band {band} for sampling frequency {fs}")
+
+    wn = wp if wp.size > 1 else wp[0]
+    sos = iirfilter(order, wn, btype=btype, rp=rp, rs=rs, analog=False, ftype=ftype, output="sos")
+
+    return sos
+
+
+def design_sos(fs, band, order=3, btype="bandpass", ftype="cheby1", rp=0.1, rs=40):
+    """
+    SOS coefficients of an IIR filter, designed on first use (shared array: do not modify).
+
+    :param band: [f_low, f_high] for band filters, a single frequency otherwise
+    """
+    band = tuple(float(f) for f in np.atleast_1d(band))
+    return _design(round(float(fs), FS_DECIMALS), band, order, btype, ftype, rp, rs)
+
+
+def sos_filtfilt(values, sos, axis=0):
+    """
+    Zero-phase filtering of all columns along `axis`, padded like scipy
+    filtfilt with the equivalent (b, a) filter (pyphysio IIRFilter).
+    """
+    padlen = 3 * (2 * len(sos) + 1)
+    return sosfiltfilt(sos, values, axis=axis, padlen=padlen)
+
+
+def bandpass_filter(values, fs, band, axis=0, **design):
+    """
+    Zero-phase IIR band-pass of an (time, ...) array with a cached design.
+    """
+    return sos_filtfilt(values, design_sos(fs, band, **design), axis=axis)
+
+
+def cache_stats():
+    """
+    {"hits", "misses", "designs"} of the filter-design cache in this process.
+    """
+    info = _design.cache_info()
+    return {"hits": info.hits, "misses": info.misses, "designs": info.currsize}
+
+
+def clear_cache():
+    _design.cache_clear()
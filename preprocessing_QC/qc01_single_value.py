@@ -4,99 +4,55 @@ This was adjusted for my own purpose.
 Methodological choices made by Andrea.
 """
 
-import os
 import pandas as pd
-import numpy as np
 
-import pyphysio.filters as flt
-import pyphysio.utils as utils
-from pyphysio.specialized.fnirs import ScalpCouplingIndexCorrelation, ScalpCouplingIndexPower, Raw2OD
-from pyphysio.sqi import SpectralPowerRatio, PercentageNAN
+from preprocessing_QC.qc_kernel import load_nirs, single_value_qc
+from preprocessing_QC.qc_driver import qc_path_table, run_qc_jobs, parse_args
 
-from pyphysio.loaders import load_snirf
 
-import data_handling.config_handling as conf
-from data_handling.external_format import _resolve_path
-from data_handling.snirf_handling import create_meta_df, merge_meta
+OUTPUT_PATH = "quality_results.parquet"
+KEY_COLUMNS = ["dyad", "member", "session", "channel"]
+RESULT_SCHEMA = {
+    "dyad": "string", "member": "string", "session": "string",
+    "f_card": "float64", "channel": "int64",
+    "perc_nan": "float64", "cnr": "float64", "sci_c": "float64", "sci_p": "float64"
+}
 
 
-bpm_max = 150
-bpm_min = 40
-f_interval = 0.4
-OUTPUT_CSV = "quality_results.csv"
+def quality_check_file(entry, fs_estimate="grid"):
+    """
+    QC job of one dyad × role × session file: (session chunk or None, message).
 
+    :param fs_estimate: see qc_kernel.load_nirs
+    """
+    dyad_id, role, sess_key, datafile = entry["dyad_id"], entry["role"], entry["file_key"], entry["path"]
 
-def run_quality_check():
-    # 1. Setup metadata
-    cgs_df, _ = create_meta_df(conf.SNIRF_DIR_CAREGIVER)
-    cls_df, _ = create_meta_df(conf.SNIRF_DIR_CHILD)
-    master_df = merge_meta(caregiver_df=cgs_df, child_df=cls_df)
+    try:
+        values, fs = load_nirs(datafile, fs_estimate=fs_estimate)
 
-    sessions = ["movie_brave", "movie_peppa", "movie_incredibles", "fc1", "fc2"]
-    roles = ["child", "caregiver"]
+        # --- QC Logic (all channels in one pass, see qc_kernel) ---
+        metrics = single_value_qc(values, fs)
 
-    # 2. Loop
-    for _, row in master_df.iterrows():
-        dyad_id = row["dyad_id"]
+        # --- COLLECT SESSION CHUNK ---
+        df_chunk = pd.DataFrame({'dyad': dyad_id, 'member': role, 'session': sess_key, **metrics})
 
-        for role in roles:
-            for sess_key in sessions:
-                try:
-                    path_info = _resolve_path(dyad_id, conf.EXTERNAL_STRUCTURE, role=role, file_key=sess_key)
-                    datafile = path_info["file_path"]
+        return df_chunk, f"Successfully processed and saved: {dyad_id} | {role} | {sess_key}"
 
-                    if not os.path.exists(datafile):
-                        continue
+    except Exception as e:
+        return None, f"FAILED {dyad_id} | {role} | {sess_key}: {e}"
 
-                    nirs, _ = load_snirf(datafile, has_stim=True)
 
-                    # --- QC Logic ---
-                    perc_nan = PercentageNAN([0, 5])(nirs).mean(dim=['component'])
-                    nirs = nirs.p.process_na('impute')
+def run_quality_check(workers=1, fresh=False, validation_report=None):
+    # 1. Setup metadata: existing dyad × role × session files (one listing per directory)
+    path_table = qc_path_table()
 
-                    f_max, f_min = bpm_max / 60, bpm_min / 60
-                    nirs_cardiac = flt.IIRFilter([f_min, f_max])(nirs)
-                    nirs_mean = nirs_cardiac.mean(dim=['component', 'channel'])
-                    psd = utils.PSD('period')(nirs_mean)
-
-                    f_peak = float(psd['freq'][np.argmax(psd.values.ravel())].values)
-                    cardiac_band = [f_peak - f_interval / 2, f_peak + f_interval / 2]
-
-                    cnr = SpectralPowerRatio([0, 1], method='period', bandN=cardiac_band, bandD=[f_min, f_max])(
-                        nirs_cardiac.mean(dim=['component']))
-
-                    sci_c = ScalpCouplingIndexCorrelation(cardiac_band=cardiac_band)(nirs_cardiac)
-                    sci_p = ScalpCouplingIndexPower(cardiac_band=cardiac_band)(nirs_cardiac)
-
-                    # --- COLLECT SESSION CHUNK ---
-                    session_results = []
-                    for i_channel in range(nirs.sizes['channel']):
-                        session_results.append({
-                            'dyad': dyad_id,
-                            'member': role,
-                            'session': sess_key,
-                            'f_card': f_peak,
-                            'channel': i_channel,
-                            'perc_nan': float(perc_nan.sel({'channel': i_channel, 'is_good': 0})),
-                            'cnr': float(cnr.sel({'channel': i_channel, 'is_good': 0})),
-                            'sci_c': float(sci_c.sel({'channel': i_channel, 'is_good': 0})),
-                            'sci_p': float(sci_p.sel({'channel': i_channel, 'is_good': 0}))
-                        })
-
-                    # 3. APPEND TO CSV IMMEDIATELY
-                    df_chunk = pd.DataFrame(session_results)
-
-                    # If the file doesn't exist, write the header. If it does, just append data.
-                    file_exists = os.path.isfile(OUTPUT_CSV)
-                    df_chunk.to_csv(OUTPUT_CSV, mode='a', index=False, header=not file_exists)
-
-                    print(f"Successfully processed and saved: {dyad_id} | {role} | {sess_key}")
-
-                except Exception as e:
-                    print(f"FAILED {dyad_id} | {role} | {sess_key}: {e}")
+    # 2. Run file jobs; chunks are stored in path-table order, written files are skipped
+    run_qc_jobs(quality_check_file, path_table, OUTPUT_PATH, KEY_COLUMNS, workers=workers, fresh=fresh,
+                validation_report=validation_report, schema=RESULT_SCHEMA)
 
 
 if __name__ == "__main__":
-    # Clean start? Delete the old file if you want a fresh run
-    # if os.path.exists(OUTPUT_CSV): os.remove(OUTPUT_CSV)
-    run_quality_check()
\ No newline at end of file
+    args = parse_args(description="Single-value fNIRS QC")
+
+    # --fresh discards existing results; otherwise files already written are skipped
+    run_quality_check(workers=args.workers, fresh=args.fresh, validation_report=args.validation_report)
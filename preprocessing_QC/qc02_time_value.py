@@ -3,117 +3,124 @@ Relates to 02_screen_quality_window.py
 This was adjusted for my own purpose.
 Methodological choices made by Andrea.
 """
-import os
 import pandas as pd
 import numpy as np
 
-import pyphysio.filters as flt
 import pyphysio.utils as utils
 from pyphysio.specialized.fnirs import ScalpCouplingIndexCorrelation, ScalpCouplingIndexPower, Raw2OD
 from pyphysio.sqi import SpectralPowerRatio, PercentageNAN
 
 from pyphysio.loaders import load_snirf
 
-import data_handling.config_handling as conf
-from data_handling.external_format import _resolve_path
-from data_handling.snirf_handling import create_meta_df, merge_meta
+from preprocessing_QC.qc_driver import qc_path_table, run_qc_jobs, parse_args
+from preprocessing_QC.filter_cache import bandpass_filter
 
 
 bpm_max = 150
 bpm_min = 40
 f_interval = 0.4
-OUTPUT_CSV = "quality_results_window.csv"
+OUTPUT_PATH = "quality_results_window.parquet"
+KEY_COLUMNS = ["dyad", "member", "session", "t_start", "channel"]
+RESULT_SCHEMA = {
+    "dyad": "string", "member": "string", "session": "string",
+    "f_card": "float64", "channel": "int64",
+    "perc_nan": "float64", "cnr": "float64", "sci_c": "float64", "sci_p": "float64",
+    "t_start": "float64", "t_stop": "float64"
+}
 wlength = 15
 
 
-def run_quality_check():
-    cgs_df, _ = create_meta_df(conf.SNIRF_DIR_CAREGIVER)
-    cls_df, _ = create_meta_df(conf.SNIRF_DIR_CHILD)
-    master_df = merge_meta(caregiver_df=cgs_df, child_df=cls_df)
+def _channel_value(metric, i_channel):
+    # .values.ravel(): float() of a one-element, non-0-d array fails on numpy >= 2
+    return float(metric.sel({'channel': i_channel, 'is_good': 0}).values.ravel()[0])
 
-    sessions = ["movie_brave", "movie_peppa", "movie_incredibles", "fc1", "fc2"]
-    roles = ["child", "caregiver"]
 
-    for _, row in master_df.iterrows():
-        dyad_id = row["dyad_id"]
+def quality_check_file(entry):
+    """
+    Windowed QC job of one dyad × role × session file: (all window rows, empty
+    if the file is shorter than one window, or None on failure; message).
+    """
+    dyad_id, role, sess_key, datafile = entry["dyad_id"], entry["role"], entry["file_key"], entry["path"]
 
-        for role in roles:
-            for sess_key in sessions:
-                try:
-                    path_info = _resolve_path(dyad_id, conf.EXTERNAL_STRUCTURE, role=role, file_key=sess_key)
-                    datafile = path_info["file_path"]
+    try:
+        # Load whole file first
+        nirs_full, _ = load_snirf(datafile, has_stim=True)
 
-                    if not os.path.exists(datafile):
-                        continue
+        # --- WINDOWING LOGIC ---
+        file_chunks = []
+        t_start = nirs_full.p.get_start_time()
+        t_stop = nirs_full.p.get_end_time()
 
-                    # Load whole file first
-                    nirs_full, _ = load_snirf(datafile, has_stim=True)
+        w_start = t_start
+        w_stop = t_start + wlength
 
-                    # --- WINDOWING LOGIC ---
-                    t_start = nirs_full.p.get_start_time()
-                    t_stop = nirs_full.p.get_end_time()
+        while w_stop <= t_stop:
+            # Segment the signal for this window
+            nirs_window = nirs_full.p.segment_time(w_start, w_stop)
 
-                    print(t_start, t_stop)
+            # --- QC Math on the Window ---
+            perc_nan = PercentageNAN([0, 5])(nirs_window).mean(dim=['component'])
+            nirs_window = nirs_window.p.process_na('impute')
 
-                    w_start = t_start
-                    w_stop = t_start + wlength
+            f_max, f_min = bpm_max / 60, bpm_min / 60
+            # IIRFilter([f_min, f_max]) as cached SOS: one design for all windows / files
+            nirs_cardiac = nirs_window.copy(
+                data=bandpass_filter(nirs_window.values, nirs_window.p.get_sampling_freq(), [f_min, f_max])
+            )
 
-                    while w_stop <= t_stop:
-                        # Segment the signal for this window
-                        nirs_window = nirs_full.p.segment_time(w_start, w_stop)
+            nirs_mean = nirs_cardiac.mean(dim=['component', 'channel'])
+            psd = utils.PSD('period')(nirs_mean)
 
-                        # --- QC Math on the Window ---
-                        perc_nan = PercentageNAN([0, 5])(nirs_window).mean(dim=['component'])
-                        nirs_window = nirs_window.p.process_na('impute')
+            f_peak = float(psd['freq'][np.argmax(psd.values.ravel())].values)
+            cardiac_band = [f_peak - f_interval / 2, f_peak + f_interval / 2]
 
-                        f_max, f_min = bpm_max / 60, bpm_min / 60
-                        nirs_cardiac = flt.IIRFilter([f_min, f_max])(nirs_window)
+            cnr = SpectralPowerRatio([0, 1], method='period', bandN=cardiac_band, bandD=[f_min, f_max])(
+                nirs_cardiac.mean(dim=['component']))
 
-                        nirs_mean = nirs_cardiac.mean(dim=['component', 'channel'])
-                        psd = utils.PSD('period')(nirs_mean)
+            sci_c = ScalpCouplingIndexCorrelation(cardiac_band=cardiac_band)(nirs_cardiac)
+            sci_p = ScalpCouplingIndexPower(cardiac_band=cardiac_band)(nirs_cardiac)
 
-                        f_peak = float(psd['freq'][np.argmax(psd.values.ravel())].values)
-                        cardiac_band = [f_peak - f_interval / 2, f_peak + f_interval / 2]
+            # --- Collect Window Chunk ---
+            session_results = []
+            for i_channel in range(nirs_window.sizes['channel']):
+                session_results.append({
+                    'dyad': dyad_id,
+                    'member': role,
+                    'session': sess_key,
+                    'f_card': f_peak,
+                    'channel': i_channel,
+                    'perc_nan': _channel_value(perc_nan, i_channel),
+                    'cnr': _channel_value(cnr, i_channel),
+                    'sci_c': _channel_value(sci_c, i_channel),
+                    'sci_p': _channel_value(sci_p, i_channel),
+                    't_start': w_start,
+                    't_stop': w_stop
+                })
 
-                        cnr = SpectralPowerRatio([0, 1], method='period', bandN=cardiac_band, bandD=[f_min, f_max])(
-                            nirs_cardiac.mean(dim=['component']))
+            # Window results (stored by the driver, in order)
+            file_chunks.append(pd.DataFrame(session_results))
 
-                        sci_c = ScalpCouplingIndexCorrelation(cardiac_band=cardiac_band)(nirs_cardiac)
-                        sci_p = ScalpCouplingIndexPower(cardiac_band=cardiac_band)(nirs_cardiac)
+            # Slide the window
+            w_start += wlength
+            w_stop += wlength
 
-                        # --- Collect Window Chunk ---
-                        session_results = []
-                        for i_channel in range(nirs_window.sizes['channel']):
-                            session_results.append({
-                                'dyad': dyad_id,
-                                'member': role,
-                                'session': sess_key,
-                                'f_card': f_peak,
-                                'channel': i_channel,
-                                'perc_nan': float(perc_nan.sel({'channel': i_channel, 'is_good': 0})),
-                                'cnr': float(cnr.sel({'channel': i_channel, 'is_good': 0})),
-                                'sci_c': float(sci_c.sel({'channel': i_channel, 'is_good': 0})),
-                                'sci_p': float(sci_p.sel({'channel': i_channel, 'is_good': 0})),
-                                't_start': w_start,
-                                't_stop': w_stop
-                            })
+        df_chunk = pd.concat(file_chunks, ignore_index=True) if file_chunks else pd.DataFrame()
+        return df_chunk, f"Successfully processed all windows: {dyad_id} | {role} | {sess_key}"
 
-                        # Append window results to CSV
-                        df_chunk = pd.DataFrame(session_results)
-                        file_exists = os.path.isfile(OUTPUT_CSV)
-                        df_chunk.to_csv(OUTPUT_CSV, mode='a', index=False, header=not file_exists)
+    except Exception as e:
+        return None, f"FAILED {dyad_id} | {role} | {sess_key}: {e}"
 
-                        # Slide the window
-                        w_start += wlength
-                        w_stop += wlength
 
-                    print(f"Successfully processed all windows: {dyad_id} | {role} | {sess_key}")
+def run_quality_check(workers=1, fresh=False, validation_report=None):
+    # dyad × role × session paths, existence from one listing per directory
+    path_table = qc_path_table()
 
-                except Exception as e:
-                    print(f"FAILED {dyad_id} | {role} | {sess_key}: {e}")
+    run_qc_jobs(quality_check_file, path_table, OUTPUT_PATH, KEY_COLUMNS, workers=workers, fresh=fresh,
+                validation_report=validation_report, schema=RESULT_SCHEMA)
 
 
 if __name__ == "__main__":
-    # Clean start? Delete the old file if you want a fresh run
-    # if os.path.exists(OUTPUT_CSV): os.remove(OUTPUT_CSV)
-    run_quality_check()
\ No newline at end of file
+    args = parse_args(description="Windowed fNIRS QC")
+
+    # --fresh discards existing results; otherwise files already written are skipped
+    run_quality_check(workers=args.workers, fresh=args.fresh, validation_report=args.validation_report)
\ No newline at end of file
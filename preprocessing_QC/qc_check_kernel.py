@@ -0,0 +1,190 @@
+"""
+Check of the qc01 kernel (qc_kernel) against the pyphysio pipeline it replaced.
+
+reference_quality_check_file() is the original pyphysio qc01 job (load_snirf,
+PercentageNAN, IIRFilter, PSD, SpectralPowerRatio, SCI; needs pyphysio and
+snirf). The check runs the kernel job and, unless an existing pyphysio table
+is given (e.g. quality_results.csv), the reference job on the same files, then
+reports qc_kernel.compare_results() per metric with TOLERANCES and the files
+on which either job failed. The exit code is 1 if any value is outside its
+tolerance or any job failed.
+
+    python -m preprocessing_QC.qc_check_kernel --workers 8
+    python -m preprocessing_QC.qc_check_kernel --reference preprocessing_QC/quality_results.csv
+
+The kernel runs here with pyphysio's fs estimate (load_nirs(fs_estimate=
+"first_step"), 1 / (t[1] - t[0])), so the check compares the arithmetic of
+the two pipelines. qc01 itself takes fs from the sampling grid; on clocks with
+timestamp jitter the first step differs from the grid step, which moves the
+PSD frequency grid (f_card, CNR bands) and the filter designs (SCI), and on
+clean clocks a band edge falling exactly on a PSD bin (2.5 Hz at 10 Hz) can
+be inside the CNR band for one estimate and outside for the other. Those are
+differences of the fs estimate, not of the kernel.
+
+Files whose dataTimeSeries columns are not [wavelength 1 | wavelength 2]
+blocks are paired by load_snirf by column position and by the kernel by
+measurementList; all their channels differ.
+"""
+
+import argparse
+import os
+import sys
+from functools import partial
+
+import numpy as np
+import pandas as pd
+
+import pyphysio.filters as flt
+import pyphysio.utils as utils
+from pyphysio.specialized.fnirs import ScalpCouplingIndexCorrelation, ScalpCouplingIndexPower
+from pyphysio.sqi import SpectralPowerRatio, PercentageNAN
+
+from pyphysio.loaders import load_snirf
+
+from preprocessing_QC.qc_kernel import bpm_max, bpm_min, f_interval, compare_results
+from preprocessing_QC.qc_sink import completed_jobs, read_qc_results
+from preprocessing_QC.qc_driver import qc_path_table, run_qc_jobs
+from preprocessing_QC.qc01_single_value import quality_check_file, KEY_COLUMNS, RESULT_SCHEMA
+
+
+KERNEL_OUTPUT_PATH = "qc_check_kernel.parquet"
+REFERENCE_OUTPUT_PATH = "qc_check_reference.parquet"
+
+# tolerances of the kernel vs pyphysio at the same fs. The kernel's filter
+# designs are cached with fs rounded to filter_cache.FS_DECIMALS; on a jittered
+# clock (fs = 1 / first step, e.g. 9.99737268 Hz) that shifts the band-pass by
+# up to ~5e-8 relative, i.e. ~1e-7 absolute in CNR / SCI (2.6e-7 relative
+# in CNR, 1.5e-7 absolute in sci_c on the fixture). f_card and perc_nan do not
+# depend on the filter design beyond the argmax bin and are exact.
+# sci_c is a correlation (near 0 on noisy channels): absolute tolerance.
+TOLERANCES = {
+    "f_card": 1e-9,
+    "perc_nan": 1e-9,
+    "cnr": 1e-6,
+    "sci_p": 1e-6
+}
+ABS_TOLERANCES = {
+    "sci_c": 1e-6
+}
+
+FILE_COLUMNS = ["dyad", "member", "session"]
+
+
+def _channel_value(metric, i_channel):
+    return float(metric.sel({'channel': i_channel, 'is_good': 0}).values.ravel()[0])
+
+
+def reference_quality_check_file(entry):
+    """
+    pyphysio qc01 job of one dyad × role × session file: (session chunk or None, message).
+    """
+    dyad_id, role, sess_key, datafile = entry["dyad_id"], entry["role"], entry["file_key"], entry["path"]
+
+    try:
+        nirs, _ = load_snirf(datafile, has_stim=True)
+
+        # --- QC Logic ---
+        perc_nan = PercentageNAN([0, 5])(nirs).mean(dim=['component'])
+        nirs = nirs.p.process_na('impute')
+
+        f_max, f_min = bpm_max / 60, bpm_min / 60
+        nirs_cardiac = flt.IIRFilter([f_min, f_max])(nirs)
+        nirs_mean = nirs_cardiac.mean(dim=['component', 'channel'])
+        psd = utils.PSD('period')(nirs_mean)
+
+        f_peak = float(psd['freq'][np.argmax(psd.values.ravel())].values)
+        cardiac_band = [f_peak - f_interval / 2, f_peak + f_interval / 2]
+
+        cnr = SpectralPowerRatio([0, 1], method='period', bandN=cardiac_band, bandD=[f_min, f_max])(
+            nirs_cardiac.mean(dim=['component']))
+
+        sci_c = ScalpCouplingIndexCorrelation(cardiac_band=cardiac_band)(nirs_cardiac)
+        sci_p = ScalpCouplingIndexPower(cardiac_band=cardiac_band)(nirs_cardiac)
+
+        # --- COLLECT SESSION CHUNK ---
+        df_chunk = pd.DataFrame([
+            {
+                'dyad': dyad_id,
+                'member': role,
+                'session': sess_key,
+                'f_card': f_peak,
+                'channel': i_channel,
+                'perc_nan': _channel_value(perc_nan, i_channel),
+                'cnr': _channel_value(cnr, i_channel),
+                'sci_c': _channel_value(sci_c, i_channel),
+                'sci_p': _channel_value(sci_p, i_channel)
+            }
+            for i_channel in range(nirs.sizes['channel'])
+        ])
+
+        return df_chunk, f"Reference processed: {dyad_id} | {role} | {sess_key}"
+
+    except Exception as e:
+        return None, f"FAILED reference {dyad_id} | {role} | {sess_key}: {e}"
+
+
+def missing_files(path_table, results):
+    """
+    Path-table files (dyad, member, session) not done in `results` (a failed
+    job): neither recorded in a Parquet result directory nor with rows in a CSV.
+    """
+    done = set()
+    if os.path.isdir(results):
+        done = completed_jobs(results, FILE_COLUMNS)
+    else:
+        results = read_qc_results(results)
+        if not results.empty and set(FILE_COLUMNS) <= set(results.columns):
+            done = set(results[FILE_COLUMNS].itertuples(index=False, name=None))
+
+    return [
+        key for key in zip(path_table["dyad_id"], path_table["role"], path_table["file_key"])
+        if key not in done
+    ]
+
+
+def check_kernel(reference=None, workers=1, fresh=False):
+    """
+    :param reference: pyphysio results (CSV or Parquet directory);
+                      None -> reference_quality_check_file on the same files
+    :return: (compare_results() table, {"kernel": [...], "reference": [...]} files
+             on which the job failed)
+    """
+    path_table = qc_path_table()
+
+    kernel_job = partial(quality_check_file, fs_estimate="first_step")
+    run_qc_jobs(kernel_job, path_table, KERNEL_OUTPUT_PATH, KEY_COLUMNS, workers=workers, fresh=fresh,
+                schema=RESULT_SCHEMA)
+
+    if reference is None:
+        run_qc_jobs(
+            reference_quality_check_file, path_table, REFERENCE_OUTPUT_PATH, KEY_COLUMNS,
+            workers=workers, fresh=fresh, schema=RESULT_SCHEMA
+        )
+        reference = REFERENCE_OUTPUT_PATH
+
+    missing = {
+        "kernel": missing_files(path_table, KERNEL_OUTPUT_PATH),
+        "reference": missing_files(path_table, reference)
+    }
+
+    comparison = compare_results(KERNEL_OUTPUT_PATH, reference, rtol=TOLERANCES, atol=ABS_TOLERANCES)
+
+    return comparison, missing
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="qc01 kernel vs pyphysio")
+    parser.add_argument("--reference", default=None, help="existing pyphysio results (CSV or Parquet directory)")
+    parser.add_argument("--workers", type=int, default=1, help="number of QC processes")
+    parser.add_argument("--fresh", action="store_true", help="discard existing check results")
+    args = parser.parse_args()
+
+    comparison, missing = check_kernel(args.reference, workers=args.workers, fresh=args.fresh)
+    print(comparison.to_string(index=False))
+
+    for side, files in missing.items():
+        for dyad_id, role, sess_key in files:
+            print(f"[MISSING] {side} job failed: {dyad_id} | {role} | {sess_key}")
+
+    failed = comparison["n_mismatch"].any() or any(missing.values())
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,162 @@
+"""
+Before / after check of the windowed QC (qc02_time_value).
+
+reference_quality_check_file() is the window loop of the original qc02 (one
+pyphysio IIRFilter per window, rows appended to a CSV), returning the rows of
+a file instead of appending them. The check runs the current qc02 job and
+the reference job on the same files, then reports qc_kernel.compare_results()
+per metric, matched on dyad / member / session / t_start / channel, with
+TOLERANCES and the files on which either job failed. The exit code is 1 if
+any value is outside its tolerance or any job failed.
+
+    python -m preprocessing_QC.qc_check_window --workers 8
+
+The original script appended each window as it went, so a file failing
+half-way left its first windows in the CSV; both jobs here return all
+windows of a file or none.
+"""
+
+import argparse
+import sys
+
+import numpy as np
+import pandas as pd
+
+import pyphysio.filters as flt
+import pyphysio.utils as utils
+from pyphysio.specialized.fnirs import ScalpCouplingIndexCorrelation, ScalpCouplingIndexPower
+from pyphysio.sqi import SpectralPowerRatio, PercentageNAN
+
+from pyphysio.loaders import load_snirf
+
+from preprocessing_QC.qc_kernel import compare_results
+from preprocessing_QC.qc_driver import qc_path_table, run_qc_jobs
+from preprocessing_QC.qc_check_kernel import missing_files
+from preprocessing_QC.qc02_time_value import (
+    quality_check_file, bpm_max, bpm_min, f_interval, wlength, KEY_COLUMNS, RESULT_SCHEMA, _channel_value
+)
+
+
+WINDOW_OUTPUT_PATH = "qc_check_window.parquet"
+REFERENCE_OUTPUT_PATH = "qc_check_window_reference.parquet"
+
+# tolerances of the current qc02 vs the original. The only change of the
+# window math is the cardiac band-pass: cached SOS with fs rounded to
+# filter_cache.FS_DECIMALS instead of IIRFilter's (b, a) at the exact fs,
+# which moves the filtered signal by ~1e-7 relative (see qc_check_kernel).
+# perc_nan is computed before the filter and is exact; f_card is the argmax
+# PSD bin and only changes if two bins are equal within that.
+# sci_c is a correlation (near 0 on noisy channels): absolute tolerance.
+TOLERANCES = {
+    "f_card": 1e-9,
+    "perc_nan": 1e-9,
+    "cnr": 1e-6,
+    "sci_p": 1e-6
+}
+ABS_TOLERANCES = {
+    "sci_c": 1e-6
+}
+
+
+def reference_quality_check_file(entry):
+    """
+    Original qc02 windows of one dyad × role × session file: (all window rows or None, message).
+    """
+    dyad_id, role, sess_key, datafile = entry["dyad_id"], entry["role"], entry["file_key"], entry["path"]
+
+    try:
+        nirs_full, _ = load_snirf(datafile, has_stim=True)
+
+        file_chunks = []
+        t_start = nirs_full.p.get_start_time()
+        t_stop = nirs_full.p.get_end_time()
+
+        w_start = t_start
+        w_stop = t_start + wlength
+
+        while w_stop <= t_stop:
+            nirs_window = nirs_full.p.segment_time(w_start, w_stop)
+
+            perc_nan = PercentageNAN([0, 5])(nirs_window).mean(dim=['component'])
+            nirs_window = nirs_window.p.process_na('impute')
+
+            f_max, f_min = bpm_max / 60, bpm_min / 60
+            nirs_cardiac = flt.IIRFilter([f_min, f_max])(nirs_window)
+
+            nirs_mean = nirs_cardiac.mean(dim=['component', 'channel'])
+            psd = utils.PSD('period')(nirs_mean)
+
+            f_peak = float(psd['freq'][np.argmax(psd.values.ravel())].values)
+            cardiac_band = [f_peak - f_interval / 2, f_peak + f_interval / 2]
+
+            cnr = SpectralPowerRatio([0, 1], method='period', bandN=cardiac_band, bandD=[f_min, f_max])(
+                nirs_cardiac.mean(dim=['component']))
+
+            sci_c = ScalpCouplingIndexCorrelation(cardiac_band=cardiac_band)(nirs_cardiac)
+            sci_p = ScalpCouplingIndexPower(cardiac_band=cardiac_band)(nirs_cardiac)
+
+            file_chunks.append(pd.DataFrame([
+                {
+                    'dyad': dyad_id,
+                    'member': role,
+                    'session': sess_key,
+                    'f_card': f_peak,
+                    'channel': i_channel,
+                    'perc_nan': _channel_value(perc_nan, i_channel),
+                    'cnr': _channel_value(cnr, i_channel),
+                    'sci_c': _channel_value(sci_c, i_channel),
+                    'sci_p': _channel_value(sci_p, i_channel),
+                    't_start': w_start,
+                    't_stop': w_stop
+                }
+                for i_channel in range(nirs_window.sizes['channel'])
+            ]))
+
+            w_start += wlength
+            w_stop += wlength
+
+        df_chunk = pd.concat(file_chunks, ignore_index=True) if file_chunks else pd.DataFrame()
+        return df_chunk, f"Reference processed all windows: {dyad_id} | {role} | {sess_key}"
+
+    except Exception as e:
+        return None, f"FAILED reference {dyad_id} | {role} | {sess_key}: {e}"
+
+
+def check_window(workers=1, fresh=False):
+    """
+    :return: (compare_results() table, {"window": [...], "reference": [...]} files
+             on which the job failed)
+    """
+    path_table = qc_path_table()
+
+    for job, output_path in [(quality_check_file, WINDOW_OUTPUT_PATH),
+                             (reference_quality_check_file, REFERENCE_OUTPUT_PATH)]:
+        run_qc_jobs(job, path_table, output_path, KEY_COLUMNS, workers=workers, fresh=fresh,
+                    schema=RESULT_SCHEMA)
+
+    missing = {
+        "window": missing_files(path_table, WINDOW_OUTPUT_PATH),
+        "reference": missing_files(path_table, REFERENCE_OUTPUT_PATH)
+    }
+    comparison = compare_results(
+        WINDOW_OUTPUT_PATH, REFERENCE_OUTPUT_PATH, rtol=TOLERANCES, atol=ABS_TOLERANCES, key_columns=KEY_COLUMNS
+    )
+
+    return comparison, missing
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="qc02 windowed metrics, current vs original")
+    parser.add_argument("--workers", type=int, default=1, help="number of QC processes")
+    parser.add_argument("--fresh", action="store_true", help="discard existing check results")
+    args = parser.parse_args()
+
+    comparison, missing = check_window(workers=args.workers, fresh=args.fresh)
+    print(comparison.to_string(index=False))
+
+    for side, files in missing.items():
+        for dyad_id, role, sess_key in files:
+            print(f"[MISSING] {side} job failed: {dyad_id} | {role} | {sess_key}")
+
+    failed = comparison["n_mismatch"].any() or any(missing.values())
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,162 @@
+"""
+Shared driver of the file-level QC scripts (qc01, qc02).
+
+Every existing dyad × role × session file is one independent job. Jobs run
+serially or in a process pool; results come back in path-table order and a
+single writer (qc_sink.ParquetResultSink) stores them, so the output is
+identical in content and row order to a serial run. Files already done are
+skipped, so an interrupted run can simply be restarted.
+
+A job function takes one path-table row (dict) and returns (chunk DataFrame,
+message): None if the job failed (retried on restart), an empty DataFrame if
+the file gave no rows (recorded as done). It must be a module-level function
+(picklable).
+
+Each process keeps its own filter-design cache; the hits / misses of every
+job are returned with its result and summed, so the reported cache_stats()
+cover the whole run, serial or pooled.
+"""
+
+import argparse
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import data_handling.config_handling as conf
+from data_handling.external_format import build_path_table
+from data_handling.snirf_handling import create_meta_df, merge_meta
+from data_handling.snirf_validation import invalid_sources
+from preprocessing_QC.qc_sink import ParquetResultSink, clear_results
+from preprocessing_QC.filter_cache import cache_stats
+
+
+SESSIONS = ["movie_brave", "movie_peppa", "movie_incredibles", "fc1", "fc2"]
+ROLES = ["child", "caregiver"]
+
+# result columns identifying one job (dyad × member × session file)
+JOB_COLUMNS = ["dyad", "member", "session"]
+
+
+def qc_path_table(sessions=SESSIONS, roles=ROLES):
+    """
+    Existing dyad × role × session files of the external DB
+    (dyads from the raw metadata, one listing per directory).
+    """
+    cgs_df, _ = create_meta_df(conf.SNIRF_DIR_CAREGIVER)
+    cls_df, _ = create_meta_df(conf.SNIRF_DIR_CHILD)
+    master_df = merge_meta(caregiver_df=cgs_df, child_df=cls_df)
+
+    path_table = build_path_table(
+        master_df["dyad_id"], conf.EXTERNAL_STRUCTURE, roles=roles, file_keys=sessions
+    )
+
+    return path_table[path_table["exists"]].reset_index(drop=True)
+
+
+def skip_invalid(path_table, validation_report):
+    """
+    Path-table rows whose raw source file (conf.SEGMENT_SPECS "source") has no
+    errors in a validate_corpus report (DataFrame or CSV path).
+    """
+    invalid = invalid_sources(validation_report)
+
+    keep = [
+        (dyad_id, role, conf.SEGMENT_SPECS[file_key]["source"]) not in invalid
+        for dyad_id, role, file_key in zip(path_table["dyad_id"], path_table["role"], path_table["file_key"])
+    ]
+    for entry in path_table.loc[[not k for k in keep]].to_dict("records"):
+        print(f"[SKIP] invalid SNIRF source: {entry['dyad_id']} | {entry['role']} | {entry['file_key']}")
+
+    return path_table[keep].reset_index(drop=True)
+
+
+def _run_job(job, entry):
+    """
+    (chunk, message, filter-cache hits / misses of this job) of one path-table row.
+    """
+    before = cache_stats()
+    df_chunk, message = job(entry)
+    after = cache_stats()
+
+    return df_chunk, message, {key: after[key] - before[key] for key in ("hits", "misses")}
+
+
+def run_qc_jobs(job, path_table, output_path, key_columns, workers=1, fresh=False,
+                validation_report=None, schema=None):
+    """
+    Runs `job` on every path-table row not yet done and stores the chunks in
+    path-table order.
+
+    :param output_path: Parquet result directory (see qc_sink)
+    :param key_columns: result columns identifying one row
+    :param schema: column -> dtype of the result rows (see qc_sink.ParquetResultSink)
+    :param workers: number of processes (1 -> serial)
+    :param fresh: discard existing results instead of resuming
+    :param validation_report: validate_corpus report (DataFrame or CSV path);
+                              files cut from invalid raw files are skipped
+    :return: number of rows written
+    """
+    if fresh:
+        clear_results(output_path)
+
+    if validation_report is not None:
+        path_table = skip_invalid(path_table, validation_report)
+
+    t0 = time.perf_counter()
+    n_rows = 0
+    designs = {"hits": 0, "misses": 0}
+
+    with ParquetResultSink(output_path, key_columns, schema=schema) as sink:
+        done = sink.completed(JOB_COLUMNS)
+        entries = [
+            entry for entry in path_table.to_dict("records")
+            if (entry["dyad_id"], entry["role"], entry["file_key"]) not in done
+        ]
+        if done:
+            print(f"Resuming: {len(path_table) - len(entries)} files already in {output_path}")
+
+        run_job = partial(_run_job, job)
+        if workers <= 1:
+            results = map(run_job, entries)
+            executor = None
+        else:
+            executor = ProcessPoolExecutor(max_workers=workers)
+            results = executor.map(run_job, entries)
+
+        try:
+            for entry, (df_chunk, message, job_designs) in zip(entries, results):
+                if df_chunk is not None:
+                    # recorded as done even without rows; failed jobs (None) run again
+                    job_key = (entry["dyad_id"], entry["role"], entry["file_key"])
+                    sink.write(df_chunk, job=dict(zip(JOB_COLUMNS, job_key)))
+                    n_rows += len(df_chunk)
+                for key, count in job_designs.items():
+                    designs[key] += count
+                print(message)
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+
+    print(f"QC: {len(entries)} files | {n_rows} rows | wall time: {time.perf_counter() - t0:.1f}s")
+    # misses = filter designs computed, at most one per (fs, band) and process
+    print(f"Filter designs (all processes): {designs}")
+
+    return n_rows
+
+
+def parse_args(description=None):
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument(
+        "--workers", type=int, default=1,
+        help="number of QC processes (default 1: serial; os.cpu_count() for all cores)"
+    )
+    parser.add_argument(
+        "--fresh", action="store_true",
+        help="discard existing results instead of resuming"
+    )
+    parser.add_argument(
+        "--validation-report", default=None,
+        help=f"skip files whose raw SNIRF has errors in this validate_corpus CSV "
+             f"(e.g. {conf.SNIRF_VALIDATION_REPORT})"
+    )
+    return parser.parse_args()
@@ -0,0 +1,359 @@
+"""
+NumPy/SciPy kernel of the qc01 single-value metrics.
+
+Re-implements, for all channels at once, the pyphysio chain used by
+qc01_single_value (pyphysio 4.x defaults):
+
+    PercentageNAN -> process_na('impute') -> IIRFilter([f_min, f_max])
+    -> PSD('period') of the channel mean (cardiac peak)
+    -> SpectralPowerRatio (CNR), ScalpCouplingIndexCorrelation / Power (SCI)
+
+Signals are (time, channel, wavelength) arrays built from the measurementList
+of data1: channel i = i-th source-detector pair (in column order), wavelength
+j = j-th wavelengthIndex. On files stored as [wavelength 1 | wavelength 2]
+column blocks this is pyphysio load_snirf's layout (channel i = columns i and
+i + n_channels); other layouts, which load_snirf mis-pairs, are read by their
+measurementList. Filters, PSDs and normalizations run along axis 0 of one 2-D
+array instead of per channel / component.
+
+compare_results() checks kernel output against a pyphysio results table
+(e.g. quality_results.csv); qc_check_kernel runs both pipelines and compares
+them with stated tolerances.
+"""
+
+import numpy as np
+import pandas as pd
+from scipy.interpolate import interp1d
+from scipy.signal import get_window
+
+import data_handling.snirf_model as model
+import data_handling.windowing as win
+from preprocessing_QC.filter_cache import FS_DECIMALS, bandpass_filter
+from preprocessing_QC.qc_sink import read_qc_results
+
+
+bpm_max = 150
+bpm_min = 40
+f_interval = 0.4
+
+# pyphysio IIRFilter defaults
+filter_order = 3
+filter_loss = 0.1
+filter_att = 40
+filter_type = "cheby1"
+
+# pyphysio PSD defaults
+nfft = 2048
+psd_window = "hamming"
+
+METRICS = ["perc_nan", "cnr", "sci_c", "sci_p"]
+
+KEY_COLUMNS = ["dyad", "member", "session", "channel"]
+
+
+def channel_layout(measurement_list, n_columns):
+    """
+    (channel, wavelength) index of every dataTimeSeries column.
+
+    Channels are the source-detector pairs in order of first appearance,
+    wavelengths the sorted wavelengthIndex values. Raises ValueError unless the
+    columns are exactly every channel at each of two wavelengths.
+    """
+    fields = ("sourceIndex", "detectorIndex", "wavelengthIndex")
+    missing = [name for name in fields if name not in measurement_list]
+    if missing:
+        raise ValueError(f"measurementList without {', '.join(missing)}")
+
+    source, detector, wavelength = (np.asarray(measurement_list[name]) for name in fields)
+    if source.size != n_columns or (source < 0).any() or (detector < 0).any() or (wavelength < 0).any():
+        raise ValueError(f"measurementList does not describe all {n_columns} dataTimeSeries columns")
+
+    pairs = list(dict.fromkeys(zip(source.tolist(), detector.tolist())))
+    wavelengths = np.unique(wavelength)
+    if wavelengths.size != 2 or n_columns != 2 * len(pairs):
+        raise ValueError(
+            f"expected {n_columns // 2} channels × 2 wavelengths, measurementList has "
+            f"{len(pairs)} source-detector pairs × {wavelengths.size} wavelengths"
+        )
+
+    pair_index = {pair: i for i, pair in enumerate(pairs)}
+    channel = np.array([pair_index[pair] for pair in zip(source.tolist(), detector.tolist())])
+    wl = np.searchsorted(wavelengths, wavelength)
+
+    if np.unique(channel * 2 + wl).size != n_columns:
+        raise ValueError("measurementList repeats a channel / wavelength combination")
+
+    return channel, wl
+
+
+def load_nirs(datafile, fs_estimate="grid"):
+    """
+    (values, fs) of a SNIRF file: values (time, channel, wavelength) laid out
+    by the measurementList (channel_layout).
+
+    :param fs_estimate: "grid" -> fs from the sampling grid of the time vector
+                        (windowing.uniform_grid; median step if there are gaps),
+                        rounded to filter_cache.FS_DECIMALS so that files sampled
+                        at the same rate share filter designs;
+                        "first_step" -> 1 / (t[1] - t[0]) as pyphysio load_snirf
+                        (for equivalence checks: on a jittered clock it moves the
+                        PSD frequency grid and the filter designs)
+    """
+    series = model.load_recording(datafile, parts=("data",)).data["data1"]
+
+    data = series.data
+    channel, wl = channel_layout(series.measurement_list, data.shape[1])
+
+    values = np.empty((data.shape[0], data.shape[1] // 2, 2), dtype=float)
+    values[:, channel, wl] = data
+
+    time = series.full_time()
+
+    if fs_estimate == "grid":
+        fs = round(1 / win.uniform_grid(time)["dt"], FS_DECIMALS)
+    elif fs_estimate == "first_step":
+        fs = 1 / (time[1] - time[0])
+    else:
+        raise ValueError(f"unknown fs_estimate {fs_estimate!r}")
+
+    return values, fs
+
+
+def impute_nan(values, fs):
+    """
+    Cubic interpolation of NaNs along time (xarray interpolate_na('time', method='cubic')).
+    NaNs before the first / after the last valid sample are kept.
+    """
+    flat = values.reshape(values.shape[0], -1)
+    nan_columns = np.flatnonzero(np.isnan(flat).any(axis=0))
+
+    if nan_columns.size == 0:
+        return values
+
+    flat = flat.copy()
+    time = np.arange(flat.shape[0]) / fs
+
+    for i_col in nan_columns:
+        column = flat[:, i_col]
+        valid = ~np.isnan(column)
+        if valid.sum() < 4:
+            continue
+        interp = interp1d(time[valid], column[valid], kind="cubic", bounds_error=False, fill_value=np.nan)
+        column[~valid] = interp(time[~valid])
+
+    return flat.reshape(values.shape)
+
+
+def bandpass(values, fs, band):
+    """
+    Zero-phase band-pass (pyphysio IIRFilter defaults) along time, all columns
+    in one call; the design is cached (filter_cache).
+    """
+    return bandpass_filter(
+        values, fs, band,
+        order=filter_order, ftype=filter_type, rp=filter_loss, rs=filter_att
+    )
+
+
+def normalize(values):
+    """
+    Standardization along time (pyphysio Normalize('standard')).
+    """
+    return (values - np.mean(values, axis=0)) / np.std(values, axis=0)
+
+
+class SpectralCache:
+    """
+    Windowed FFT of every column, computed once per qc01 file. (qc02 windows
+    still run the pyphysio PSD / SpectralPowerRatio / SCI chain.)
+
+    The PSD of any average of columns is derived from the cached FFT
+    (the FFT is linear), so the cardiac peak (mean of all columns) and the
+    CNR (mean of the wavelengths of each channel) share one transform.
+    Matches pyphysio PSD('period') = scipy periodogram: first nfft samples,
+    mean removed, Hamming window, one-sided.
+    """
+    __slots__ = ("fs", "freqs", "fft", "_scale")
+
+    def __init__(self, values, fs):
+        segment = values[:nfft]
+        segment = segment - np.mean(segment, axis=0)
+
+        window = get_window(psd_window, segment.shape[0])
+        window = window.reshape((-1,) + (1,) * (segment.ndim - 1))
+
+        self.fs = fs
+        self.fft = np.fft.rfft(segment * window, n=nfft, axis=0)
+        self._scale = {
+            "density": 1.0 / (fs * np.sum(window ** 2)),
+            "spectrum": 1.0 / np.sum(window) ** 2
+        }
+
+        # pyphysio labels the PSD with its own frequency grid
+        self.freqs = np.linspace(0, fs / 2, int(nfft / 2 + 1))
+
+    def psd(self, fft=None, scaling="density"):
+        """
+        One-sided PSD along axis 0 of `fft` (default: the cached FFT of every column).
+        """
+        fft = self.fft if fft is None else fft
+
+        power = np.abs(fft) ** 2 * self._scale[scaling]
+        # one-sided: double all bins but DC (and Nyquist for even nfft)
+        power[1:nfft // 2 + nfft % 2] *= 2
+
+        return power
+
+    def band(self, band, inclusive=True):
+        if inclusive:
+            return (self.freqs >= band[0]) & (self.freqs <= band[1])
+        return (self.freqs > band[0]) & (self.freqs < band[1])
+
+
+def cardiac_peak(spectra):
+    """
+    Frequency of the PSD maximum of the mean over channels and wavelengths.
+
+    :param spectra: SpectralCache of the (time, channel, wavelength) cardiac signal
+    """
+    fft = spectra.fft
+    power = spectra.psd(np.nanmean(fft.reshape(fft.shape[0], -1), axis=1))
+    return float(spectra.freqs[np.argmax(power)])
+
+
+def spectral_power_ratio(spectra, band_n, band_d):
+    """
+    Per channel: power in band_n / power in band_d (bands inclusive) of the
+    mean over wavelengths.
+    """
+    power = spectra.psd(np.nanmean(spectra.fft, axis=2))
+    return power[spectra.band(band_n)].sum(axis=0) / power[spectra.band(band_d)].sum(axis=0)
+
+
+def sci_correlation(z):
+    """
+    Correlation of the two wavelengths per channel.
+
+    :param z: normalized cardiac-band signal (time, channel, wavelength)
+    """
+    return np.mean(z[:, :, 0] * z[:, :, 1], axis=0)
+
+
+def sci_power(z, fs, cardiac_band):
+    """
+    Peak power (inside cardiac_band, exclusive) of the normalized product of
+    the two normalized wavelengths, per channel.
+
+    :param z: normalized cardiac-band signal (time, channel, wavelength)
+    """
+    z = z + 10
+    product = normalize(z[:, :, 0] * z[:, :, 1] / 100)
+
+    spectra = SpectralCache(product, fs)
+    power = spectra.psd(scaling="spectrum")
+
+    return power[spectra.band(cardiac_band, inclusive=False)].max(axis=0)
+
+
+def single_value_qc(values, fs):
+    """
+    qc01 metrics of all channels in one pass.
+
+    One FFT of the cardiac signal serves the cardiac peak and the CNR; one
+    re-filtering in the cardiac band serves both SCI metrics.
+
+    :param values: (time, channel, wavelength) raw intensities
+    :return: dict of columns (one row per channel):
+             f_card, channel, perc_nan, cnr, sci_c, sci_p
+    """
+    n_time, n_channels, _ = values.shape
+
+    perc_nan = (100 * np.isnan(values).sum(axis=0) / n_time).mean(axis=1)
+    values = impute_nan(values, fs)
+
+    f_max, f_min = bpm_max / 60, bpm_min / 60
+    cardiac = bandpass(values, fs, [f_min, f_max])
+    spectra = SpectralCache(cardiac, fs)
+
+    f_peak = cardiac_peak(spectra)
+    cardiac_band = [f_peak - f_interval / 2, f_peak + f_interval / 2]
+
+    cnr = spectral_power_ratio(spectra, cardiac_band, [f_min, f_max])
+
+    # SCI: cardiac signal re-filtered in cardiac_band and normalized (pyphysio SCI)
+    z = normalize(bandpass(cardiac, fs, cardiac_band))
+
+    return {
+        "f_card": np.full(n_channels, f_peak),
+        "channel": np.arange(n_channels),
+        "perc_nan": perc_nan,
+        "cnr": cnr,
+        "sci_c": sci_correlation(z),
+        "sci_p": sci_power(z, fs, cardiac_band)
+    }
+
+
+def compare_results(results, reference, rtol=1e-6, atol=0.0, key_columns=KEY_COLUMNS):
+    """
+    Kernel results vs a pyphysio results table (DataFrames, CSV paths or
+    Parquet result directories), matched on key_columns (default dyad /
+    member / session / channel; qc02 tables add t_start).
+
+    Result rows without a reference row (e.g. the reference job failed on that
+    file, or the reference table is empty) count as mismatches of every metric.
+
+    :param rtol: relative tolerance, or dict metric -> relative tolerance
+    :param atol: absolute tolerance, or dict metric -> absolute tolerance (default 0)
+    :return: DataFrame per metric (f_card + METRICS): rtol, atol, n_rows, n_missing_reference,
+             max_abs_diff, max_rel_diff (over matched rows), n_mismatch (outside rtol,
+             NaN on one side or no reference row counts as mismatch)
+    """
+    key_columns = list(key_columns)
+    columns = key_columns + ["f_card"] + METRICS
+
+    if isinstance(results, str):
+        results = read_qc_results(results, key_columns)
+    if isinstance(reference, str):
+        reference = read_qc_results(reference)
+
+    if results.empty or not set(columns) <= set(results.columns):
+        results = pd.DataFrame(columns=columns)
+    if reference.empty or not set(columns) <= set(reference.columns):
+        # same dtypes as results, so the merge keys match
+        reference = results.iloc[0:0]
+
+    reference = reference.drop_duplicates(key_columns, keep="last")
+    merged = results.merge(
+        reference[columns], on=key_columns, how="left", suffixes=("", "_ref"), indicator=True
+    )
+    missing = (merged["_merge"] == "left_only").to_numpy()
+
+    rows = []
+    for metric in ["f_card"] + METRICS:
+        metric_rtol = rtol.get(metric, 0.0) if isinstance(rtol, dict) else rtol
+        metric_atol = atol.get(metric, 0.0) if isinstance(atol, dict) else atol
+        ours = merged[metric].to_numpy(dtype=float)
+        ref = merged[f"{metric}_ref"].to_numpy(dtype=float)
+        close = np.isclose(ours, ref, rtol=metric_rtol, atol=metric_atol, equal_nan=True) & ~missing
+
+        diff = np.abs(ours - ref)[~missing]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rel_diff = np.where(diff == 0, 0.0, diff / np.abs(ref[~missing]))
+
+        rows.append({
+            "metric": metric,
+            "rtol": metric_rtol,
+            "atol": metric_atol,
+            "n_rows": len(merged),
+            "n_missing_reference": int(missing.sum()),
+            "max_abs_diff": _nanmax(diff),
+            "max_rel_diff": _nanmax(rel_diff),
+            "n_mismatch": int((~close).sum())
+        })
+
+    return pd.DataFrame(rows)
+
+
+def _nanmax(values):
+    values = values[~np.isnan(values)]
+    return float(values.max()) if values.size else np.nan
@@ -0,0 +1,213 @@
+"""
+Buffered Parquet sink for QC results, with resumable runs.
+
+A result table is a directory of Parquet part files (part-00000.parquet, ...):
+
+    - chunks (rows of one dyad × member × session file) are buffered in memory
+      and flushed together as one part file (a single row group);
+    - rows are stored with a fixed schema (given, or that of the existing
+      parts, or inferred from the first part) and de-duplicated on the key
+      columns within a part;
+    - a part file is written to a temporary name and renamed, so an interrupted
+      run leaves only complete parts;
+    - the jobs written with a part (also those that produced no rows) are
+      recorded in a jobs file of the same number (jobs-00000.parquet, ...),
+      written after the part;
+    - on restart, completed() reads the jobs files and the key columns of the
+      existing parts and the driver skips the files already done.
+
+read_qc_results() loads a Parquet result directory (or a legacy CSV) and drops
+duplicated keys, keeping the last row.
+"""
+
+import glob
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+
+# rows kept in memory before a part file is written
+# (also the work lost at most by an interrupted run)
+BUFFER_ROWS = 2000
+
+_PART_PATTERN = "part-*.parquet"
+_JOBS_PATTERN = "jobs-*.parquet"
+
+
+def _arrow_schema(schema):
+    """
+    pyarrow schema from a pa.Schema or a dict column -> dtype ("string", "int64", "float64", ...).
+    """
+    if schema is None or isinstance(schema, pa.Schema):
+        return schema
+
+    return pa.schema([
+        (column, pa.string() if dtype in ("str", "string") else pa.from_numpy_dtype(np.dtype(dtype)))
+        for column, dtype in schema.items()
+    ])
+
+
+class ParquetResultSink:
+    """
+    :param path: result directory (created if missing)
+    :param key_columns: columns identifying one result row,
+                        e.g. dyad, member, session, channel[, t_start]
+    :param buffer_rows: rows buffered before a part file is flushed
+    :param schema: column -> dtype dict (or pa.Schema) of the result rows;
+                   None -> schema of the existing parts, else inferred from
+                   the first part written
+    """
+
+    def __init__(self, path, key_columns, buffer_rows=BUFFER_ROWS, schema=None):
+        self.path = path
+        self.key_columns = list(key_columns)
+        self.buffer_rows = buffer_rows
+        self._buffer = []
+        self._jobs = []
+        self._n_buffered = 0
+
+        os.makedirs(path, exist_ok=True)
+        parts = self._parts()
+        files = parts + self._parts(_JOBS_PATTERN)
+        self._next_part = max(int(os.path.basename(f)[5:10]) for f in files) + 1 if files else 0
+
+        self._schema = _arrow_schema(schema)
+        if self._schema is None and parts:
+            self._schema = pq.read_schema(parts[0]).remove_metadata()
+
+    def _parts(self, pattern=_PART_PATTERN):
+        return sorted(glob.glob(os.path.join(self.path, pattern)))
+
+    def completed(self, columns):
+        """
+        Set of `columns` value tuples already done (see completed_jobs).
+        """
+        return completed_jobs(self.path, columns)
+
+    def write(self, df_chunk, job=None):
+        """
+        Buffers one chunk; flushes when buffer_rows is reached.
+        A chunk is never split across part files.
+
+        :param job: dict column -> value of the job that produced the chunk,
+                    recorded as completed with the part (even if the chunk is empty)
+        """
+        if job is not None:
+            self._jobs.append(job)
+
+        if df_chunk is None or df_chunk.empty:
+            return
+
+        if self._schema is not None:
+            self._check_columns(df_chunk)
+
+        self._buffer.append(df_chunk)
+        self._n_buffered += len(df_chunk)
+
+        if self._n_buffered >= self.buffer_rows:
+            self.flush()
+
+    def _check_columns(self, rows):
+        unknown = [column for column in rows.columns if column not in self._schema.names]
+        if unknown:
+            raise ValueError(f"columns {unknown} not in the result schema of {self.path}")
+
+    def _table(self, rows):
+        if self._schema is None:
+            self._schema = pa.Schema.from_pandas(rows, preserve_index=False)
+
+        # missing columns are stored as nulls
+        rows = rows.reindex(columns=self._schema.names)
+        return pa.Table.from_pandas(rows, schema=self._schema, preserve_index=False)
+
+    def _write_part(self, table, pattern):
+        part_path = os.path.join(self.path, pattern.replace("*", f"{self._next_part:05d}"))
+        tmp_path = f"{part_path}.writing"
+
+        pq.write_table(table, tmp_path, row_group_size=max(len(table), 1))
+        os.replace(tmp_path, part_path)
+
+    def flush(self):
+        if not self._buffer and not self._jobs:
+            return
+
+        if self._buffer:
+            rows = pd.concat(self._buffer, ignore_index=True)
+            rows = rows.drop_duplicates(self.key_columns, keep="last")
+            self._write_part(self._table(rows), _PART_PATTERN)
+
+        # after the rows: a recorded job always has its rows on disk
+        if self._jobs:
+            self._write_part(pa.Table.from_pylist(self._jobs), _JOBS_PATTERN)
+
+        self._next_part += 1
+        self._buffer = []
+        self._jobs = []
+        self._n_buffered = 0
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def completed_jobs(path, columns):
+    """
+    Set of `columns` value tuples done in a result directory: recorded jobs
+    (also those without rows) and keys of the written rows (reads only those columns).
+    """
+    done = set()
+    for pattern in (_JOBS_PATTERN, _PART_PATTERN):
+        parts = sorted(glob.glob(os.path.join(path, pattern)))
+        if parts:
+            keys = pq.ParquetDataset(parts).read(columns=list(columns)).to_pandas()
+            done |= set(keys.itertuples(index=False, name=None))
+
+    return done
+
+
+def clear_results(path):
+    """
+    Removes a result directory with its job records (fresh run).
+    """
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+
+
+def read_qc_results(path, key_columns=None):
+    """
+    QC result table from a Parquet result directory or a CSV file.
+
+    :param key_columns: if given, duplicated keys are dropped (last row kept)
+    """
+    if os.path.isdir(path):
+        parts = sorted(glob.glob(os.path.join(path, _PART_PATTERN)))
+        results = pq.ParquetDataset(parts).read().to_pandas() if parts else pd.DataFrame()
+    else:
+        results = pd.read_csv(path)
+
+    if key_columns is not None and not results.empty:
+        results = results.drop_duplicates(list(key_columns), keep="last").reset_index(drop=True)
+
+    return results
+
+
+def import_csv(csv_path, path, key_columns, buffer_rows=BUFFER_ROWS, schema=None):
+    """
+    Converts a legacy appended CSV (possibly with repeated runs) into a result directory.
+    """
+    results = read_qc_results(csv_path, key_columns)
+
+    with ParquetResultSink(path, key_columns, buffer_rows, schema) as sink:
+        for _, df_chunk in results.groupby(["dyad", "member", "session"], sort=False):
+            sink.write(df_chunk)
+
+    return results